@@ -0,0 +1,234 @@
+"""Benchmarks of the normalizers and of the construction of the words.
+
+The inputs are seeded random directive bi-sequences and adversarial ones
+(periodic bi-sequences needing a rewrite for almost every pair), of
+increasing lengths. Every benchmark is timed (best of `repeat` runs) and
+the results are written as JSON, so that a run can be compared with a
+stored baseline:
+
+    python bench_tgpc.py --output baseline.json
+    python bench_tgpc.py --baseline baseline.json
+
+The comparison lists the benchmarks slower than the baseline by more than
+the threshold and the exit status is 1 if there are some.
+"""
+
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+
+import tgpc
+
+# Periodic bi-sequences (delta, theta) with many rewrites during normalization
+ADVERSARIAL = {
+    "0/1": ("0", "1"),
+    "10/10": ("10", "10"),
+    "01/12": ("01", "12"),
+    "100101/010101": ("100101", "010101"),
+}
+
+def random_biseq(rnd, length):
+    """A random bi-sequence (delta, theta) of the length."""
+    delta = "".join(rnd.choice("012") for _ in range(length))
+    theta = "".join(rnd.choice("012R") for _ in range(length))
+    return delta, theta
+
+def adversarial_biseq(family, length):
+    """The bi-sequence of the adversarial family cut to the length."""
+    delta, theta = ADVERSARIAL[family]
+    return ((delta*length)[:length], (theta*length)[:length])
+
+def make_inputs(length, seed, samples = 3):
+    """The inputs `(kind, delta, theta)` of the length: `samples` random
+    bi-sequences and one of each adversarial family."""
+    rnd = random.Random("{0}-{1}".format(seed, length))
+    inputs = [("random", *random_biseq(rnd, length)) for _ in range(samples)]
+    inputs.extend((family, *adversarial_biseq(family, length)) for family in ADVERSARIAL)
+    return inputs
+
+def best_time(function, repeat):
+    """The shortest time of `repeat` calls of the function."""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def count_rewrites(delta, theta):
+    """The number of rules applied by Normalizer012 to (delta, theta)."""
+    stats = tgpc.NormalizationStats()
+    tgpc.Normalizer012(stats = stats).normalize(delta, theta)
+    return stats.rewrites
+
+def _record(benchmark, kind, length, seconds, **extra):
+    record = {"benchmark": benchmark, "input": kind, "length": length, "seconds": seconds}
+    record.update(extra)
+    return record
+
+def bench_normalizers(lengths, seed, repeat, max_word_length):
+    """Times Normalizer012 and NaiveNormalizer012 on bi-sequences of the
+    lengths. The naive normalizer is skipped when the word is longer than
+    max_word_length."""
+    normalizer = tgpc.Normalizer012()
+    naive_normalizer = tgpc.NaiveNormalizer012()
+    records = []
+    for length in lengths:
+        for kind, delta, theta in make_inputs(length, seed):
+            seconds = best_time(lambda: normalizer.normalize(delta, theta), repeat)
+            records.append(_record("Normalizer012.normalize", kind, length, seconds,
+                                   rewrites = count_rewrites(delta, theta)))
+            word_length = tgpc.GPSWord(delta, theta).length
+            if word_length <= max_word_length:
+                seconds = best_time(lambda: naive_normalizer.normalize(delta, theta), repeat)
+                records.append(_record("NaiveNormalizer012.normalize", kind, length, seconds,
+                                       word_length = word_length))
+    return records
+
+def bench_words(lengths, seed, repeat, max_word_length):
+    """Times make_word012 on bi-sequences of the lengths, skipping the words
+    longer than max_word_length."""
+    records = []
+    for length in lengths:
+        for kind, delta, theta in make_inputs(length, seed):
+            word_length = tgpc.GPSWord(delta, theta).length
+            if word_length <= max_word_length:
+                seconds = best_time(lambda: tgpc.make_word012(delta, theta), repeat)
+                records.append(_record("make_word012", kind, length, seconds,
+                                       word_length = word_length))
+    return records
+
+def bench_closures(lengths, seed, repeat):
+    """Times the palindromic and E_i-palindromic closures of random words and
+    of prefixes of GPS words (having long pseudopalindromic suffixes)."""
+    records = []
+    gps_word = tgpc.make_word012(*adversarial_biseq("100101/010101", 14))
+    for length in lengths:
+        rnd = random.Random("{0}-{1}".format(seed, length))
+        words = [("random", "".join(rnd.choice("012") for _ in range(length)))]
+        while len(gps_word) < length:
+            gps_word = gps_word + gps_word[::-1]
+        words.append(("gps prefix", gps_word[:length]))
+        for kind, word in words:
+            seconds = best_time(lambda: tgpc.make_pal_closure(word), repeat)
+            records.append(_record("make_pal_closure", kind, length, seconds))
+            seconds = best_time(lambda: tgpc.make_eipal_closure(word, 1), repeat)
+            records.append(_record("make_eipal_closure", kind, length, seconds))
+    return records
+
+def bench_rules_checker(repeat):
+    """Times the construction of the rules and their automata, which the
+    checkers of a process share."""
+    checker = tgpc._Normalization012_rules_checker
+    return [_record("rules checker construction", "-", 0,
+                    best_time(checker._build_tables, repeat))]
+
+def scaling(records):
+    """The scaling exponents: for every benchmark and input kind, the slope
+    of log(seconds) against log(size) by least squares, where the size is
+    the length of the word when it is known (make_word012 and the naive 
+    normalizer), otherwise the length of the input."""
+    points = {}
+    for record in records:
+        size = record.get("word_length", record["length"])
+        if size > 0 and record["seconds"] > 0:
+            key = "{0} [{1}]".format(record["benchmark"], record["input"])
+            points.setdefault(key, []).append((math.log(size), math.log(record["seconds"])))
+    exponents = {}
+    for key, curve in points.items():
+        mean_x = sum(x for x, _ in curve)/len(curve)
+        mean_y = sum(y for _, y in curve)/len(curve)
+        variance = sum((x - mean_x)**2 for x, _ in curve)
+        if variance == 0:
+            continue
+        covariance = sum((x - mean_x)*(y - mean_y) for x, y in curve)
+        exponents[key] = round(covariance/variance, 2)
+    return exponents
+
+def run(lengths, word_lengths, closure_lengths, seed = 0, repeat = 3,
+        max_word_length = 10**6):
+    """Runs all the benchmarks and returns the results as a dictionary
+    ready for JSON."""
+    records = []
+    records.extend(bench_rules_checker(repeat))
+    records.extend(bench_normalizers(lengths, seed, repeat, max_word_length))
+    records.extend(bench_words(word_lengths, seed, repeat, max_word_length))
+    records.extend(bench_closures(closure_lengths, seed, repeat))
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "repeat": repeat,
+        "results": records,
+        "scaling": scaling(records),
+    }
+
+def compare(results, baseline, threshold = 0.25):
+    """The benchmarks slower than in the baseline by more than the threshold,
+    as tuples `(benchmark, input, length, baseline seconds, seconds)`.
+
+    The times of the same benchmark, input kind and length are summed (there
+    are several random inputs), the benchmarks missing in one of the runs
+    are ignored.
+    """
+    def totals(run_results):
+        times = {}
+        for record in run_results["results"]:
+            key = (record["benchmark"], record["input"], record["length"])
+            times[key] = times.get(key, 0) + record["seconds"]
+        return times
+    old, new = totals(baseline), totals(results)
+    return [key + (old[key], new[key]) for key in sorted(new)
+            if key in old and new[key] > (1 + threshold)*old[key]]
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument("--lengths", type = int, nargs = "+", default = [64, 128, 256, 512, 1024],
+                        help = "lengths of the bi-sequences given to the normalizers")
+    parser.add_argument("--word-lengths", type = int, nargs = "+", default = [8, 12, 16, 20, 24],
+                        help = "lengths of the bi-sequences given to make_word012")
+    parser.add_argument("--closure-lengths", type = int, nargs = "+",
+                        default = [1000, 10000, 100000],
+                        help = "lengths of the words given to the closures")
+    parser.add_argument("--max-word-length", type = int, default = 10**6,
+                        help = "longest word made by make_word012 or the naive normalizer")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--repeat", type = int, default = 3)
+    parser.add_argument("--output", help = "JSON file where the results are written")
+    parser.add_argument("--baseline", help = "JSON file of results to compare with")
+    parser.add_argument("--threshold", type = float, default = 0.25,
+                        help = "relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    results = run(args.lengths, args.word_lengths, args.closure_lengths, args.seed,
+                  args.repeat, args.max_word_length)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent = 1)
+
+    for record in results["results"]:
+        extra = ", ".join("{0} = {1}".format(key, value) for key, value in record.items()
+                          if key not in {"benchmark", "input", "length", "seconds"})
+        print("{0:<30} {1:<15} {2:>7} {3:>12.6f}s  {4}".format(
+            record["benchmark"], record["input"], record["length"], record["seconds"], extra))
+    print("\nScaling exponents (seconds ~ length**exponent):")
+    for key, exponent in sorted(results["scaling"].items()):
+        print("  {0:<50} {1}".format(key, exponent))
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.threshold)
+        print("\n{} regression(s) compared with {}".format(len(regressions), args.baseline))
+        for benchmark, kind, length, old, new in regressions:
+            print("  {0} [{1}] length {2}: {3:.6f}s -> {4:.6f}s".format(
+                benchmark, kind, length, old, new))
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,9 +4,36 @@
 # In[ ]:
 
 
+import asyncio
+import functools
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
 import unittest
+import unittest.mock
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import tgpc
+import tgpc_cli
 from tgpc import *
+from tgpc import _Normalization012_rules_checker
+from tgpc_cli import AsyncNormalizer, _serve_http, _serve_stdio
+
+def random_biseq(rnd, length):
+    """A random bi-sequence (delta, theta) of the length."""
+    delta = "".join(rnd.choice("012") for _ in range(length))
+    theta = "".join(rnd.choice("012R") for _ in range(length))
+    return delta, theta
 
 testcases = (
     ("0011", "00RR", ('0011', '00RR', True)),
@@ -34,7 +61,8 @@ testcases = (
     ("0121202", "021R200", ('012120210', '021R20120', False)),
     ("012111202", "021R1R200", ('01211120210', '021R1R20120', False)),
     ("21022101", "RR021210", ('21202210210', '20R02120120', False)),
-    ("01022101", "RR021210", ('01002210210', '02R02120120', False))
+    ("01022101", "RR021210", ('01002210210', '02R02120120', False)),
+    ("100101", "010101", ('1201012012', '1021021021', False))
 )
 
 class TestNormalization012(unittest.TestCase):
@@ -50,6 +78,648 @@ class TestNormalization012(unittest.TestCase):
         for d, t, result in testcases:
             self.assertEqual(nn.normalize(d,t), result)
 
+    def test_empty(self):
+        # the empty bi-sequence is normalized, as in iter_normalized(0)
+        expected = ("", "", True)
+        self.assertEqual(Normalizer012().normalize("", ""), expected)
+        self.assertEqual(Normalizer012(cache_size = 10).normalize(BiSequence("", "")), expected)
+        self.assertEqual(NaiveNormalizer012().normalize("", ""), expected)
+        self.assertEqual(OnlineNormalizer012().result(), expected)
+        self.assertTrue(is_normalized("", ""))
+        self.assertIsNone(Normalizer012().first_change("", ""))
+        self.assertEqual(list(normalize_many([("", ""), ("01", "0R")], workers = 1)),
+                         [expected, ("010", "02R", False)])
+        self.assertEqual(cross_validate(0, workers = 1),
+                         {"checked": 1, "skipped": 0, "mismatches": []})
+
+    def test_pseudopalindromic_prefixes(self):
+        random.seed(11)
+        for _ in range(50):
+            w = make_word012("".join(random.choice("012") for _ in range(6)),
+                             "".join(random.choice("012R") for _ in range(6)))
+            types = NaiveNormalizer012._pseudopalindromic_prefixes(w)
+            for l in range(1, len(w) + 1):
+                expected = next((t for t in "012" if is_eipal(w[:l], int(t))),
+                                "R" if is_pal(w[:l]) else None)
+                self.assertEqual(types[l], expected)
+
+    def test_normalize_many(self):
+        pairs = [(d, t) for d, t, result in testcases]
+        results = [result for d, t, result in testcases]
+        self.assertEqual(list(normalize_many(pairs, workers = 1)), results)
+        self.assertEqual(list(normalize_many(pairs, workers = 2, chunksize = 3)), results)
+        self.assertEqual(list(normalize_many(pairs, workers = 2, naive = True)), results)
+        self.assertEqual(sorted(normalize_many(pairs, workers = 2, chunksize = 2, ordered = False)),
+                         list(enumerate(results)))
+    
+    def test_normalize_many_memory(self):
+        # The results are streamed: the peak of memory does not grow with
+        # the number of bi-sequences
+        def pairs(count):
+            rnd = random.Random(8)
+            for _ in range(count):
+                yield random_biseq(rnd, 12)
+        
+        def peak(count, ordered):
+            tracemalloc.start()
+            try:
+                for _ in normalize_many(pairs(count), workers = 2, chunksize = 50, 
+                                        ordered = ordered):
+                    pass
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        
+        for ordered in (True, False):
+            peak(500, ordered)
+            self.assertLess(peak(10000, ordered), 2*peak(1000, ordered))
+    
+    def test_BiSequence(self):
+        n = Normalizer012()
+        nn = NaiveNormalizer012()
+        for d, t, result in testcases:
+            biseq = BiSequence(d, t)
+            self.assertEqual((biseq.delta, biseq.theta, len(biseq)), (d, t, len(d)))
+            self.assertEqual(list(biseq), list(zip(d, t)))
+            self.assertEqual(BiSequence.from_bytes(bytes(biseq)), biseq)
+            self.assertEqual(biseq[1:], BiSequence(d[1:], t[1:]))
+            self.assertEqual(n.normalize(biseq), result)
+            self.assertEqual(nn.normalize(biseq), result)
+            self.assertEqual(make_word012(biseq), make_word012(d, t))
+            self.assertEqual(list(iter_prefixes(biseq)), list(iter_prefixes(d, t)))
+        self.assertRaises(ValueError, BiSequence, "013", "000")
+        self.assertRaises(ValueError, BiSequence, "01", "0")
+        self.assertRaises(ValueError, BiSequence.from_bytes, b"\x0c")
+        self.assertRaises(TypeError, n.normalize, BiSequence("01", "00"), "00")
+    
+    def test_sequences(self):
+        # Other sequences of letters than strings are accepted, as strings
+        n = Normalizer012()
+        nn = NaiveNormalizer012()
+        for d, t, result in testcases:
+            for sequence in (list, tuple):
+                d_seq, t_seq = sequence(d), sequence(t)
+                self.assertEqual(n.normalize(d_seq, t_seq), result)
+                self.assertEqual(nn.normalize(d_seq, t_seq), result)
+                self.assertEqual(n.first_change(d_seq, t_seq), n.first_change(d, t))
+                self.assertEqual(BiSequence(d_seq, t_seq), BiSequence(d, t))
+                self.assertEqual(make_word012(d_seq, t_seq), make_word012(d, t))
+        self.assertEqual(n.normalize(list("0011"), list("00RR")), ("0011", "00RR", True))
+        self.assertRaises(ValueError, n.normalize, [0, 1], ["0", "R"])
+    
+    def test_stats(self):
+        stats = NormalizationStats()
+        traced = []
+        n = Normalizer012(stats = stats)
+        for d, t, result in testcases:
+            self.assertEqual(n.normalize(d,t), result)
+        self.assertEqual(stats.normalizations, len(testcases))
+        self.assertEqual(sum(stats.rule_counts.values()), stats.rewrites)
+        self.assertGreater(stats.rewrites, 0)
+        stats.reset()
+        stats.trace = lambda position, rule, delta, theta: traced.append((position, rule, delta, theta))
+        n.normalize("0102110", "02R0121")
+        self.assertEqual(traced, [(6, "factor rule 3: 111201", "0102110", "02R0121")])
+        self.assertEqual(stats.as_dict()["rewrites"], 1)
+    
+    def test_cache(self):
+        n = Normalizer012()
+        cached = Normalizer012(cache_size = 20)
+        rnd = random.Random(23)
+        for d, t, result in testcases:
+            for permutation in itertools.permutations("012"):
+                letters = dict(zip("012R", permutation + ("R",)))
+                dp = "".join(letters[x] for x in d)
+                tp = "".join(letters[x] for x in t)
+                self.assertEqual(cached.normalize(dp, tp), n.normalize(dp, tp))
+                self.assertEqual(cached.normalize(BiSequence(dp, tp)), n.normalize(dp, tp))
+        info = cached.cache_info()
+        self.assertEqual(info.hits + info.misses, 12*len(testcases))
+        self.assertLessEqual(info.currsize, 20)
+        # every bi-sequence is a miss at most once per permutation
+        self.assertGreaterEqual(info.hits, 6*len(testcases))
+        small = Normalizer012(cache_size = 20, cache_memory = 200)
+        for _ in range(100):
+            d, t = random_biseq(rnd, 20)
+            self.assertEqual(small.normalize(d, t), n.normalize(d, t))
+            self.assertLessEqual(small.cache_info().memory, 200)
+        small.cache_clear()
+        self.assertEqual(small.cache_info()[:4], (0, 0, 20, 0))
+        self.assertIsNone(n.cache_info())
+    
+    def test_first_change(self):
+        n = Normalizer012()
+        nn = NaiveNormalizer012()
+        rnd = random.Random(24)
+        for _ in range(300):
+            length = rnd.randint(1, 9)
+            d, t = random_biseq(rnd, length)
+            if rnd.random() < 0.5:
+                d, t, _ = n.normalize(d, t)
+                d, t = d[:9], t[:9]
+            new_delta, new_theta, notchanged = nn.normalize(d, t)
+            expected = None
+            if not notchanged:
+                expected = 0
+                while d[expected] == new_delta[expected] and t[expected] == new_theta[expected]:
+                    expected = expected + 1
+            self.assertEqual(n.first_change(d, t), expected)
+            self.assertEqual(nn.first_change(BiSequence(d, t)), expected)
+            self.assertEqual(is_normalized(d, t), notchanged)
+            self.assertEqual(is_normalized(d, t, naive = True), notchanged)
+        self.assertIsNone(n.first_change("", ""))
+        self.assertRaises(ValueError, is_normalized, "01", "0")
+    
+    def test_shared_rules_tables(self):
+        self.assertIs(Normalizer012()._rules_checker._goto, Normalizer012()._rules_checker._goto)
+        built = _Normalization012_rules_checker._build_tables()
+        self.assertEqual(Normalizer012()._rules_checker._goto, built["_goto"])
+    
+    def test_cross_validate(self):
+        report = cross_validate(3, workers = 2, shard_length = 1)
+        self.assertEqual((report["checked"], report["skipped"], report["mismatches"]), (1728, 0, []))
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, "checkpoint.json")
+            self.assertEqual(cross_validate(3, checkpoint, workers = 1, shard_length = 1), report)
+            # resuming after an interruption checks only the remaining shards
+            with open(checkpoint) as checkpoint_file:
+                saved = json.load(checkpoint_file)
+            saved["done"] = saved["done"][:5]
+            saved["checked"] = 5*144
+            with open(checkpoint, "w") as checkpoint_file:
+                json.dump(saved, checkpoint_file)
+            self.assertEqual(cross_validate(3, checkpoint, workers = 1, shard_length = 1), report)
+            self.assertRaises(ValueError, cross_validate, 4, checkpoint, 1, 1)
+        report = cross_validate(3, workers = 1, max_word_length = 4)
+        self.assertEqual(report["checked"] + report["skipped"], 1728)
+        self.assertGreater(report["skipped"], 0)
+    
+    def test_OnlineNormalizer012(self):
+        n = Normalizer012()
+        rnd = random.Random(3)
+        for _ in range(100):
+            length = rnd.randint(1, 30)
+            d, t = random_biseq(rnd, length)
+            on = OnlineNormalizer012()
+            new_delta, new_theta = "", ""
+            for k in range(length):
+                delta_part, theta_part = on.push(d[k], t[k])
+                new_delta, new_theta = new_delta + delta_part, new_theta + theta_part
+                self.assertEqual(on.result(), n.normalize(d[:k+1], t[:k+1]),
+                                 msg = "problem: ({0}, {1})".format(d[:k+1], t[:k+1]))
+            self.assertEqual((new_delta, new_theta), on.result()[:2])
+    
+    def test_iter_normalized(self):
+        n = Normalizer012()
+        for length in range(1, 4):
+            normalized = sorted((d, t) for d in map("".join, itertools.product("012", repeat = length))
+                                for t in map("".join, itertools.product("012R", repeat = length))
+                                if n.normalize(d, t)[2])
+            self.assertEqual(sorted(iter_normalized(length)), normalized)
+            self.assertEqual(sorted(iter_normalized(length, workers = 2)), normalized)
+            self.assertEqual(count_normalized(length), len(normalized))
+        for length in range(4, 7):
+            self.assertEqual(count_normalized(length), len(list(iter_normalized(length))))
+        self.assertEqual(list(iter_normalized(6, workers = 3)), list(iter_normalized(6)))
+        # The subtrees are streamed by chunks: the first bi-sequences come 
+        # without enumerating a whole subtree of depth 3
+        leaves = iter_normalized(12, canonical = True, workers = 2)
+        self.assertEqual(list(itertools.islice(leaves, 5)),
+                         list(itertools.islice(iter_normalized(12, canonical = True), 5)))
+        leaves.close()
+    
+    def test_incremental_rescan(self):
+        n = Normalizer012()
+        n_full = Normalizer012(incremental = False)
+        for d, t, result in testcases:
+            self.assertEqual(n_full.normalize(d,t), result)
+        rnd = random.Random(0)
+        for _ in range(500):
+            length = rnd.randint(1, 60)
+            d, t = random_biseq(rnd, length)
+            self.assertEqual(n.normalize(d,t), n_full.normalize(d,t),
+                             msg = "problem: ({0}, {1})".format(d, t))
+
+class TestClosures(unittest.TestCase):
+    
+    @staticmethod
+    def closure(seq, check, image):
+        # the closure by definition: the shortest pseudopalindrome with prefix seq
+        i = 0
+        while not check(seq[i:]):
+            i = i + 1
+        return seq + image(seq[:i])
+    
+    def test_closures(self):
+        rnd = random.Random(0)
+        for _ in range(500):
+            w = "".join(rnd.choice("012") for _ in range(rnd.randint(0, 25)))
+            self.assertEqual(make_pal_closure(w), 
+                             self.closure(w, is_pal, lambda u: u[::-1]))
+            for i in range(3):
+                ei = Ei(i)
+                self.assertEqual(make_eipal_closure(w, i),
+                                 self.closure(w, lambda u: is_eipal(u, i),
+                                              lambda u: "".join(ei[int(x)] for x in u[::-1])),
+                                 msg = "problem: ({0}, {1})".format(w, i))
+    
+    def test_make_word012(self):
+        rnd = random.Random(0)
+        for _ in range(500):
+            length = rnd.randint(1, 12)
+            d, t = random_biseq(rnd, length)
+            w = ""
+            for letter, antimorphism in zip(d, t):
+                if antimorphism == "R":
+                    w = make_pal_closure(w + letter)
+                else:
+                    w = make_eipal_closure(w + letter, antimorphism)
+            self.assertEqual(make_word012(d, t), w,
+                             msg = "problem: ({0}, {1})".format(d, t))
+        self.assertEqual(make_word012("0011", "012R", seed = "1"), 
+                         "102021100212101212001120201")
+
+    def test_internal_logging(self):
+        # The words log their prefixes, not the normalization made inside
+        with self.assertLogs("tgpc", "INFO") as logs:
+            make_word012("0102110", "02R0121")
+            GPSWord("0102110", "02R0121")[40]
+        messages = [record.getMessage() for record in logs.records]
+        self.assertIn("w1 = 0", messages)
+        self.assertFalse([message for message in messages if "rule" in message])
+        with self.assertLogs("tgpc", "INFO") as logs:
+            Normalizer012().normalize("0102110", "02R0121")
+        self.assertTrue([record for record in logs.records if "rule" in record.getMessage()])
+
+    def test_make_words012(self):
+        rnd = random.Random(25)
+        stem = ("0121", "R01R")
+        pairs = []
+        for _ in range(100):
+            length = rnd.randint(0, 6)
+            d, t = random_biseq(rnd, length)
+            pairs.append((stem[0] + d, stem[1] + t))
+        pairs.extend([("", ""), BiSequence("01", "2R"), pairs[0]])
+        for seed in ("", "20"):
+            words = {}
+            make_words012(pairs, words.__setitem__, seed = seed)
+            self.assertEqual(len(words), len(pairs))
+            for index, pair in enumerate(pairs):
+                if isinstance(pair, BiSequence):
+                    self.assertEqual(words[index], make_word012(pair, seed = seed))
+                else:
+                    self.assertEqual(words[index], make_word012(*pair, seed = seed))
+        self.assertRaises(ValueError, make_words012, [("01", "0R"), ("0", "3")], 
+                          lambda index, word: self.fail("a word made before checking"))
+    
+    def test_iter_prefixes(self):
+        rnd = random.Random(1)
+        for _ in range(300):
+            length = rnd.randint(1, 12)
+            d, t = random_biseq(rnd, length)
+            prefixes = list(iter_prefixes(d, t))
+            self.assertEqual(len(prefixes), length)
+            self.assertEqual(prefixes[-1], make_word012(d, t))
+            for k in range(1, length):
+                self.assertEqual(prefixes[k], make_word012(d[:k+1], t[:k+1]))
+        self.assertEqual(list(iter_prefixes("0", "R", seed = "10")), ["1001"])
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_numpy_backend(self):
+        rnd = random.Random(13)
+        nn = NaiveNormalizer012()
+        nn_numpy = NaiveNormalizer012(backend = "numpy")
+        for _ in range(200):
+            length = rnd.randint(1, 10)
+            d, t = random_biseq(rnd, length)
+            w = "".join(rnd.choice("012") for _ in range(rnd.randint(0, 5)))
+            self.assertEqual(make_word012(d, t, backend = "numpy"), make_word012(d, t))
+            self.assertEqual(make_word012(d, t, w, backend = "numpy"), make_word012(d, t, w))
+            self.assertEqual(nn_numpy.normalize(d, t), nn.normalize(d, t))
+            self.assertEqual(make_pal_closure(w, backend = "numpy"), make_pal_closure(w))
+            for i in range(3):
+                self.assertEqual(make_eipal_closure(w, i, backend = "numpy"),
+                                 make_eipal_closure(w, i))
+        # many candidate starts of the longest palindromic suffix
+        w = "0"*3000 + "1" + "0"*2000
+        self.assertEqual(make_pal_closure(w, backend = "numpy"), make_pal_closure(w))
+        self.assertEqual(make_eipal_closure(w, 0, backend = "numpy"), make_eipal_closure(w, 0))
+        # with colliding hashes, the suffixes are still compared letter by letter
+        zero_hashes = lambda word, powers: numpy.zeros(len(word) + 1, dtype = numpy.uint64)
+        with unittest.mock.patch.object(tgpc, "_numpy_prefix_hashes", zero_hashes):
+            for w in ("0102", "01021", "1201"*50 + "2"):
+                self.assertEqual(make_pal_closure(w, backend = "numpy"), make_pal_closure(w))
+                self.assertEqual(make_eipal_closure(w, 2, backend = "numpy"), make_eipal_closure(w, 2))
+
+class TestGPSWord(unittest.TestCase):
+    
+    def test_letters_and_factors(self):
+        rnd = random.Random(2)
+        for _ in range(200):
+            length = rnd.randint(0, 10)
+            d, t = random_biseq(rnd, length)
+            w = make_word012(d, t)
+            gps_word = GPSWord(d, t)
+            self.assertEqual(len(gps_word), len(w))
+            self.assertEqual("".join(gps_word[i] for i in range(len(w))), w)
+            self.assertEqual(gps_word[-1:-len(w)//2:-1], w[-1:-len(w)//2:-1])
+            for _ in range(10):
+                a = rnd.randint(-len(w), len(w))
+                b = rnd.randint(-len(w), len(w))
+                self.assertEqual(gps_word[a:b], w[a:b])
+            self.assertEqual(gps_word.prefix_lengths,
+                             tuple(len(prefix) for prefix in iter_prefixes(d, t)))
+    
+    def test_long_word(self):
+        gps_word = GPSWord("0121"*30, "R012"*30)
+        self.assertRaises(IndexError, gps_word.__getitem__, gps_word.length)
+        # the word is an E_2-palindrome since theta ends with 2
+        self.assertTrue(is_eipal(gps_word[:50] + gps_word[-50:], 2))
+    
+    def test_deep_factors(self):
+        # More closures than the recursion limit
+        rnd = random.Random(1)
+        length = sys.getrecursionlimit() + 1000
+        d, t = random_biseq(rnd, length)
+        gps_word = GPSWord(d, t)
+        for start in (gps_word.length//3, gps_word.length - 30):
+            self.assertEqual(gps_word[start:start + 20], 
+                             "".join(gps_word[i] for i in range(start, start + 20)))
+        # The factors made without copying them from the short prefix
+        with unittest.mock.patch.object(GPSWord, "_SHORT_PREFIX", 1):
+            for _ in range(100):
+                length = rnd.randint(1, 10)
+                d, t = random_biseq(rnd, length)
+                w = make_word012(d, t)
+                a, b = sorted((rnd.randint(0, len(w)), rnd.randint(0, len(w))))
+                self.assertEqual(GPSWord(d, t)[a:b], w[a:b])
+
+class TestAsyncNormalizer(unittest.TestCase):
+
+    def test_normalize(self):
+        rnd = random.Random(22)
+        pairs = []
+        for _ in range(300):
+            length = rnd.randint(0, 30)
+            pairs.append(random_biseq(rnd, length))
+        
+        async def normalize_all():
+            async with AsyncNormalizer(workers = 2, max_batch = 16, max_pending = 50) as normalizer:
+                results = await asyncio.gather(*(normalizer.normalize(d, t) for d, t in pairs))
+                with self.assertRaises(ValueError):
+                    await normalizer.normalize("0", "3")
+                with self.assertRaises(asyncio.TimeoutError):
+                    await normalizer.normalize("01"*1000, "0R"*1000, timeout = 0)
+                results.append(await normalizer.normalize(BiSequence("01", "0R")))
+                return results
+        
+        normalizer = Normalizer012()
+        expected = [normalizer.normalize(d, t) for d, t in pairs] + [("010", "02R", False)]
+        self.assertEqual(asyncio.run(normalize_all()), expected)
+
+    def failing_normalizer(self):
+        """Patches Normalizer012 to raise RuntimeError for delta "0000",
+        the forked workers inheriting the patch."""
+        normalize = Normalizer012.normalize
+        def failing_normalize(self, delta, theta = None):
+            if isinstance(delta, BiSequence) and delta.delta == "0000":
+                raise RuntimeError("failure")
+            return normalize(self, delta, theta)
+        return unittest.mock.patch.object(Normalizer012, "normalize", failing_normalize)
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == "fork",
+                         "the workers inherit the patched normalizer")
+    def test_failing_item(self):
+        async def normalize_batch():
+            async with AsyncNormalizer(workers = 1, max_batch = 8, max_delay = 0.05) as normalizer:
+                return await asyncio.gather(normalizer.normalize("0011", "00RR"),
+                                            normalizer.normalize("0000", "RRRR"),
+                                            normalizer.normalize("01", "0R"),
+                                            return_exceptions = True)
+        
+        with self.failing_normalizer():
+            results = asyncio.run(normalize_batch())
+        self.assertEqual(results[0], ("0011", "00RR", True))
+        self.assertIsInstance(results[1], RuntimeError)
+        self.assertEqual(results[2], ("010", "02R", False))
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == "fork",
+                         "the workers inherit the patched normalizer")
+    def test_serve_stdio(self):
+        requests = ['{"id": 1, "delta": "0102110", "theta": "02R0121"}', '',
+                    '{"id": 2, "delta": "01", "theta": "0X"}', '{"id": 3, "delta": "0000", "theta": "RRRR"}',
+                    '[1, 2', '{"id": 5, "delta": "0011", "theta": "00RR"}']
+        output = io.StringIO()
+        
+        async def serve():
+            async with AsyncNormalizer(workers = 1) as normalizer:
+                await _serve_stdio(normalizer, io.StringIO("\n".join(requests)), output)
+        
+        with self.failing_normalizer():
+            asyncio.run(serve())
+        responses = [json.loads(line) for line in output.getvalue().splitlines()]
+        responses.sort(key = lambda response: response.get("id", 4))
+        self.assertEqual(responses[0], {"id": 1, "delta": "01021102", "theta": "02R01201",
+                                        "notchanged": False})
+        self.assertEqual(set(responses[1]), {"id", "error"})
+        self.assertEqual(responses[2], {"id": 3, "error": "RuntimeError: failure"})
+        self.assertEqual(set(responses[3]), {"error"})
+        self.assertEqual(responses[4], {"id": 5, "delta": "0011", "theta": "00RR", "notchanged": True})
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == "fork",
+                         "the workers inherit the patched normalizer")
+    def test_serve_http(self):
+        bodies = [b'{"delta": "0102110", "theta": "02R0121"}', b'{"delta": "0000", "theta": "RRRR"}',
+                  b'{"delta": "01"}', b'{"delta": "0011", "theta": "00RR"}']
+        
+        async def request(reader, writer, request_line, body):
+            writer.write(request_line + b"\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            line = await reader.readline()
+            while line.strip():
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+                line = await reader.readline()
+            return status, json.loads(await reader.readexactly(length))
+        
+        async def serve():
+            async with AsyncNormalizer(workers = 1) as normalizer:
+                server = await asyncio.start_server(functools.partial(_serve_http, normalizer),
+                                                    "127.0.0.1", 0)
+                async with server:
+                    port = server.sockets[0].getsockname()[1]
+                    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                    responses = [await request(reader, writer, b"POST /normalize HTTP/1.1", body)
+                                 for body in bodies]
+                    responses.append(await request(reader, writer, b"GET / HTTP/1.1", b""))
+                    responses.append(await request(reader, writer, b"POST", b""))
+                    self.assertEqual(await reader.read(), b"")
+                    writer.close()
+                    return responses
+        
+        with self.failing_normalizer():
+            responses = asyncio.run(serve())
+        self.assertEqual(responses[0], (200, {"delta": "01021102", "theta": "02R01201",
+                                              "notchanged": False}))
+        self.assertEqual(responses[1], (500, {"error": "RuntimeError: failure"}))
+        self.assertEqual(responses[2][0], 400)
+        self.assertEqual(responses[3], (200, {"delta": "0011", "theta": "00RR", "notchanged": True}))
+        self.assertEqual([status for status, _ in responses[4:]], [404, 400])
+
+class TestCommandLine(unittest.TestCase):
+    
+    def run_main(self, arguments, text):
+        with tempfile.TemporaryDirectory() as directory:
+            input_path = os.path.join(directory, "input")
+            output_path = os.path.join(directory, "output")
+            with open(input_path, "w") as input_file:
+                input_file.write(text)
+            status = main(arguments + [input_path, "-o", output_path])
+            with open(output_path) as output_file:
+                return status, output_file.read()
+    
+    def test_normalize(self):
+        text = "".join("{0} {1}\n".format(d, t) for d, t, result in testcases)
+        expected = "".join("{0} {1} {2}\n".format(*result) for d, t, result in testcases)
+        self.assertEqual(self.run_main(["normalize", "--workers", "1"], text), (0, expected))
+        self.assertEqual(self.run_main(["normalize", "--workers", "2", "--chunksize", "4"], text),
+                         (0, expected))
+        self.assertEqual(self.run_main(["normalize", "--format", "csv"], "delta,theta\n01,0R\n"),
+                         (0, "010,02R,False\n"))
+        self.assertEqual(self.run_main(["normalize", "--format", "jsonl", "--workers", "1"],
+                                       '{"delta": "01", "theta": "0R"}\n["0011", "00RR"]\n'),
+                         (0, '{"delta": "010", "theta": "02R", "notchanged": false}\n'
+                             '{"delta": "0011", "theta": "00RR", "notchanged": true}\n'))
+        self.assertEqual(self.run_main(["normalize", "--workers", "1"], "01 0R\n013 000\n"),
+                         (1, "010 02R False\n"))
+        self.assertEqual(self.run_main(["normalize", "--format", "jsonl", "--workers", "1"],
+                                       '["", ""]\n["0", ""]\n'),
+                         (1, '{"delta": "", "theta": "", "notchanged": true}\n'))
+    
+    def test_word(self):
+        self.assertEqual(self.run_main(["word", "--workers", "1"], "0011 012R\n01 0R\n"), 
+                         (0, "11\n3\n"))
+        self.assertEqual(self.run_main(["word", "--words", "--workers", "2"], "0011 012R\n"), 
+                         (0, "00221112200\n"))
+        self.assertEqual(self.run_main(["word", "--words", "--max-length", "5"], "0011 012R\n")[0], 1)
+    
+    def test_streaming(self):
+        # With several workers, at most 2*workers chunks are in progress (and
+        # the one being read): the records read and not yet written are 
+        # bounded, whatever the number of records
+        rnd = random.Random(19)
+        lines = ["{0} {1}\n".format(*random_biseq(rnd, 12)) for _ in range(4000)]
+        read_records, result_writer = tgpc_cli._read_records, tgpc_cli._result_writer
+        counts = {}
+        
+        def counting_records(lines, format):
+            for record in read_records(lines, format):
+                counts["read"] = counts["read"] + 1
+                yield record
+        
+        def counting_writer(output, format):
+            write = result_writer(output, format)
+            def counting_write(result):
+                counts["written"] = counts["written"] + 1
+                counts["in_progress"] = max(counts["in_progress"], 
+                                            counts["read"] - counts["written"])
+                write(result)
+            return counting_write
+        
+        with tempfile.TemporaryDirectory() as directory:
+            input_path, output = os.path.join(directory, "input"), os.path.join(directory, "output")
+            with open(input_path, "w") as input_file:
+                input_file.writelines(lines)
+            for command in ("normalize", "word"):
+                counts.update(read = 0, written = 0, in_progress = 0)
+                with unittest.mock.patch.object(tgpc_cli, "_read_records", counting_records), \
+                     unittest.mock.patch.object(tgpc_cli, "_result_writer", counting_writer):
+                    status = main([command, "--workers", "2", "--chunksize", "50", input_path,
+                                   "-o", output])
+                self.assertEqual((status, counts["written"]), (0, 4000))
+                self.assertLessEqual(counts["in_progress"], (2*2 + 1)*50)
+
+class TestPackedWord(unittest.TestCase):
+    
+    def test_build_and_open(self):
+        rnd = random.Random(20)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "word")
+            for _ in range(100):
+                length = rnd.randint(1, 10)
+                d, t = random_biseq(rnd, length)
+                w = make_word012(d, t)
+                # small chunks to read and write the images in several parts
+                with PackedWord.build(path, d, t, chunk = rnd.choice([4, 8, 20])) as packed_word:
+                    self.assertEqual(packed_word[:], w)
+                with PackedWord(path) as packed_word:
+                    self.assertEqual(len(packed_word), len(w))
+                    a = rnd.randint(-len(w), len(w))
+                    b = rnd.randint(-len(w), len(w))
+                    self.assertEqual(packed_word[a:b], w[a:b])
+                    self.assertEqual(packed_word[a % len(w)], w[a % len(w)])
+                    view = packed_word.packed
+                    self.assertEqual(len(view), (len(w) + 3)//4)
+                    view.release()
+            with PackedWord.build(path, "", "") as packed_word:
+                self.assertEqual(packed_word[:], "")
+            with open(path, "wb") as word_file:
+                word_file.write(b"not a word")
+            self.assertRaises(ValueError, PackedWord, path)
+
+class TestFactorIndex(unittest.TestCase):
+
+    def test_queries(self):
+        rnd = random.Random(21)
+        words = ["".join(rnd.choice("012") for _ in range(rnd.randint(0, 15)))
+                 for _ in range(40)]
+        words.append(make_word012("01201", "R0R21"))
+        for w in words:
+            index = FactorIndex(w)
+            self.assertEqual(len(index), len(w))
+            for _ in range(20):
+                a = rnd.randint(0, len(w))
+                factors = [w[a:rnd.randint(a, len(w))],
+                           "".join(rnd.choice("012") for _ in range(rnd.randint(1, 5)))]
+                for u in factors:
+                    self.assertEqual(u in index, u in w)
+                    self.assertEqual(index.count(u),
+                                     sum(w.startswith(u, i) for i in range(len(w) - len(u) + 1)))
+                    self.assertEqual(index.find(u), w.find(u))
+            self.assertEqual(index.complexity(8),
+                             [len({w[i:i+n] for i in range(len(w) - n + 1)}) for n in range(9)])
+        self.assertRaises(ValueError, FactorIndex, "0123")
+
+class TestPalindromeIndex(unittest.TestCase):
+
+    @staticmethod
+    def is_pseudopal(seq, t):
+        if seq == "":
+            return True
+        return is_pal(seq) if t == "R" else is_eipal(seq, t)
+
+    def test_queries(self):
+        rnd = random.Random(12)
+        words = ["".join(rnd.choice("012") for _ in range(rnd.randint(0, 12)))
+                 for _ in range(30)]
+        words.append(make_word012("01201", "R0R21"))
+        for w in words:
+            index = PalindromeIndex(w)
+            for _ in range(20):
+                a = rnd.randint(0, len(w))
+                b = rnd.randint(a, len(w))
+                factor = w[a:b]
+                for t in "012R":
+                    self.assertEqual(index.is_pseudopal(a, b, t), self.is_pseudopal(factor, t))
+                    self.assertEqual(index.longest_pseudopal_suffix(a, b, t),
+                                     max(l for l in range(len(factor) + 1)
+                                         if self.is_pseudopal(factor[len(factor)-l:], t)))
+                    self.assertEqual(index.longest_pseudopal_prefix(a, b, t),
+                                     max(l for l in range(len(factor) + 1)
+                                         if self.is_pseudopal(factor[:l], t)))
+        self.assertRaises(ValueError, PalindromeIndex("012").is_pseudopal, 0, 3, "3")
+
 if __name__ == '__main__':
     unittest.main()
 
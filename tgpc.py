@@ -1,19 +1,247 @@
+import bisect
+import collections
+import functools
 import itertools
-import re
+import json
 import logging
 import math
-logging.basicConfig(format='%(message)s', level=logging.ERROR)
+import mmap
+import multiprocessing
+import operator
+import os
+import queue
+import sys
+import time
+
+try:
+    import numpy
+except ImportError:
+    # The NumPy backend is optional
+    numpy = None
+# The logger of the module, its messages are shown with set_logging
+_logger = logging.getLogger(__name__)
+_logger.addHandler(logging.NullHandler())
+# The logger of the normalizations made inside the module to build the words,
+# which shows only warnings and errors unless its level is set
+_internal_logger = _logger.getChild("internal")
+_internal_logger.setLevel(logging.WARNING)
+
+# The pairs (delta_i, theta_i) of a directive bi-sequence and their codes
+_PAIRS = tuple(d + t for d in "012" for t in "012R")
+_PAIR_CODES = {pair: code for code, pair in enumerate(_PAIRS)}
+# Tables for bytes.translate giving delta_i and theta_i from the code of a pair
+_DELTA_OF_CODE = bytes(ord(pair[0]) for pair in _PAIRS).ljust(256, b"?")
+_THETA_OF_CODE = bytes(ord(pair[1]) for pair in _PAIRS).ljust(256, b"?")
+# Tables for bytes.translate giving the part of the code of a pair given by 
+# the letter of delta (4*index) and by the letter of theta (index)
+_CODE_OF_DELTA = bytes(4*"012".index(chr(b)) if chr(b) in "012" else 0 for b in range(256))
+_CODE_OF_THETA = bytes("012R".index(chr(b)) if chr(b) in "012R" else 0 for b in range(256))
+# The letters of delta and theta
+_TERNARY = frozenset("012")
+_THETA_LETTERS = frozenset("012R")
+# Tables for bytes.translate of the codes of the pairs for the substitutions
+# of letters used by Normalizer012, by the items of the substitution
+_PAIR_SUBSTITUTIONS = {}
+# State of the prefix rules automaton from which no rule can match anymore
+_DEAD_STATE = 1
+
+# Tables for str.translate of the letter permutations of E_0, E_1 and E_2
+_EI_TRANSLATIONS = (str.maketrans("012", "021"), str.maketrans("012", "210"),
+                    str.maketrans("012", "102"))
+_TRANSLATIONS = {"0": _EI_TRANSLATIONS[0], "1": _EI_TRANSLATIONS[1], 
+                 "2": _EI_TRANSLATIONS[2], "R": {}}
+# Tables for bytes.translate of the letters stored as the values 0, 1, 2: the
+# images by the antimorphisms, the letters '0', '1', '2', and the 2-bit fields
+# of a byte of PackedWord (with the letter at the bits 2*shift)
+_LETTER_IMAGES = {t: bytes(int(("012".translate(_TRANSLATIONS[t]) + "0"*256)[b]) 
+                           for b in range(256)) for t in "012R"}
+_LETTERS_OF_VALUES = bytes(48 + b if b < 3 else 63 for b in range(256))
+_UNPACK_TABLES = tuple(bytes(b >> 2*shift & 3 for b in range(256)) for shift in range(4))
+_PACK_TABLES = tuple(bytes((b & 3) << 2*shift for b in range(256)) for shift in range(4))
+# Lookup tables of the letter permutations of E_0, E_1 and E_2 for the NumPy
+# backend, where the letters are stored as the uint8 values 0, 1 and 2
+if numpy is not None:
+    _NUMPY_TABLES = {"0": numpy.array([0, 2, 1], dtype=numpy.uint8),
+                     "1": numpy.array([2, 1, 0], dtype=numpy.uint8),
+                     "2": numpy.array([1, 0, 2], dtype=numpy.uint8)}
+    # Polynomial hashes of the closures, modulo a prime less than 2**31 so
+    # that the products of two residues fit in 64 bits
+    _HASH_MODULUS = numpy.uint64(2**31 - 1)
+    _HASH_BASE = numpy.uint64(1000003)
+    _hash_powers = numpy.array([1], dtype=numpy.uint64)
+
+class BiSequence:
+    """A directive bi-sequence (delta, theta), checked once and stored as
+    the bytes of the codes of its pairs (delta_i, theta_i).
+    
+    It can be given instead of (delta, theta) to Normalizer012.normalize, 
+    NaiveNormalizer012.normalize and make_word012, which do not check it
+    again.
+    
+    Examples:
+        >>> b = BiSequence("0102110", "02R0121")
+        >>> b
+        BiSequence('0102110', '02R0121')
+        >>> len(b), b[1], b[2:4]
+        (7, ('1', '2'), BiSequence('02', 'R0'))
+        >>> Normalizer012().normalize(b)
+        ('01021102', '02R01201', False)
+        >>> BiSequence.from_bytes(bytes(b)) == b
+        True
+    """
+    __slots__ = ("_codes",)
+    
+    def __init__(self, delta, theta):
+        """Checks and encodes the bi-sequence.
+        
+        Args:
+            delta (str): The sequence delta of the directive bi-sequence,
+                composed of the letters '0', '1' and '2'.
+            theta (str): The sequence theta of the directive bi-sequence,
+                composed from the letters 'R', '0', '1' and '2', where 
+                the last three stand for E_0, E_1 and E_2. Must have the 
+                same length as delta.
+        """
+        delta, theta = _check_dt(delta, theta)
+        self._codes = bytes(_encode_biseq(delta, theta))
+    
+    @classmethod
+    def from_bytes(cls, codes):
+        """The bi-sequence given by the codes of its pairs, as given by
+        bytes(bi_sequence)."""
+        codes = bytes(codes)
+        if codes and max(codes) >= len(_PAIRS):
+            raise ValueError("{} is not a code of a pair".format(max(codes)))
+        biseq = object.__new__(cls)
+        biseq._codes = codes
+        return biseq
+    
+    @property
+    def delta(self):
+        """The sequence delta (str)."""
+        return self._codes.translate(_DELTA_OF_CODE).decode()
+    
+    @property
+    def theta(self):
+        """The sequence theta (str)."""
+        return self._codes.translate(_THETA_OF_CODE).decode()
+    
+    def __bytes__(self):
+        return self._codes
+    
+    def __len__(self):
+        return len(self._codes)
+    
+    def __getitem__(self, index):
+        """The pair (delta_i, theta_i) at the index or the bi-sequence given
+        by a slice."""
+        if isinstance(index, slice):
+            return BiSequence.from_bytes(self._codes[index])
+        pair = _PAIRS[self._codes[index]]
+        return (pair[0], pair[1])
+    
+    def __iter__(self):
+        return ((_PAIRS[code][0], _PAIRS[code][1]) for code in self._codes)
+    
+    def __eq__(self, other):
+        if not isinstance(other, BiSequence):
+            return NotImplemented
+        return self._codes == other._codes
+    
+    def __hash__(self):
+        return hash(self._codes)
+    
+    def __repr__(self):
+        return "BiSequence({0!r}, {1!r})".format(self.delta, self.theta)
 
 class Normalizer012:
     """Object for normalizing a ternary directive bi-sequences 
     using the new normalization algorithm.
     """
     
-    def __init__(self):
-        """Initialization of the normalization rules checker."""
+    def __init__(self, incremental = True, stats = None, cache_size = 0, cache_memory = None):
+        """Initialization of the normalization rules checker.
+        
+        Args:
+            incremental (bool): If True (default), the search for the next
+                applicable rule resumes from the position of the last
+                correction instead of scanning the whole bi-sequence again.
+            stats (NormalizationStats): Collects the rules applied and the
+                time spent looking for them, optional. Without it, nothing 
+                is measured.
+            cache_size (int): The number of results kept in a LRU cache, 
+                none by default. The results are kept for the bi-sequences
+                with the letters in the order 0,1,2, so one result serves
+                all the bi-sequences differing by a permutation of letters.
+            cache_memory (int): The largest size in bytes of the cached
+                bi-sequences, no limit if None.
+        """
         self._rules_checker = _Normalization012_rules_checker()
+        self._incremental = incremental
+        self.stats = stats
+        self._cache = _ResultCache(cache_size, cache_memory) if cache_size > 0 else None
+        self._logger = _logger
+    
+    def first_change(self, delta, theta = None):
+        """The index of the first pair of the directive bi-sequence changed
+        by the normalization, or None if it is normalized (notchanged).
+        
+        The search stops at the first applicable rule, no rule is applied.
+        
+        Args:
+            delta (str): The sequence delta of the directive bi-sequence,
+                or a BiSequence, then theta is not given.
+            theta (str): The sequence theta of the directive bi-sequence.
+        
+        Returns:
+            The index i such that the pairs (delta_j, theta_j) for j < i 
+            are those of the normalized bi-sequence, but not the pair i.
+            
+        Examples:
+            >>> n = Normalizer012()
+            >>> n.first_change("0102110", "02R0121"), n.first_change("0011", "00RR")
+            (6, None)
+        """
+        if isinstance(delta, BiSequence):
+            _check_no_theta(theta)
+            biseq = bytearray(delta._codes)
+        else:
+            delta, theta = _check_dt(delta, theta)
+            biseq = _encode_biseq(delta, theta)
+        if not biseq:
+            return None
+        biseq, _ = self._change_letters_order(biseq)
+        # Changed by the initial normalization: (0, R) in the prefix (0^l, {R,E_0}^l)
+        i = 0
+        while i < len(biseq) and biseq[i] in (_PAIR_CODES["00"], _PAIR_CODES["0R"]):
+            if biseq[i] == _PAIR_CODES["0R"]:
+                return i
+            i = i + 1
+        applicable_rule = self._rules_checker.find_applicable_rule(biseq)
+        return applicable_rule[0] if applicable_rule else None
+    
+    def cache_info(self):
+        """The statistics of the cache of results, as a named tuple 
+        `(hits, misses, maxsize, currsize, memory, maxmemory)`, or None if
+        there is no cache.
         
-    def normalize(self, delta, theta):
+        Examples:
+            >>> n = Normalizer012(cache_size = 100)
+            >>> n.normalize("0102110", "02R0121")
+            ('01021102', '02R01201', False)
+            >>> n.normalize("1210221", "10R1202")
+            ('12102210', '10R12012', False)
+            >>> n.cache_info()
+            CacheInfo(hits=1, misses=1, maxsize=100, currsize=1, memory=81, maxmemory=None)
+        """
+        return self._cache.info() if self._cache is not None else None
+    
+    def cache_clear(self):
+        """Removes all the cached results and resets their statistics."""
+        if self._cache is not None:
+            self._cache.clear()
+        
+    def normalize(self, delta, theta = None):
         """Ternary normalization algorithm.
         
         Normalization function that returns the normalized directive
@@ -23,6 +251,7 @@ class Normalizer012:
         Args:
             delta (str): The sequence delta of the directive bi-sequence.
                 It should be composed of the letters '0', '1' and '2'.
+                It can also be a BiSequence, then theta is not given.
             theta (str): The sequence theta of the directive bi-sequence.
                 It should be composed from the letters 'R', '0', '1' and
                 '2', where the last three stand for E_0, E_1 and E_2.
@@ -31,7 +260,8 @@ class Normalizer012:
             Returns the tuple `(new_delta, new_theta, notchanged)` where 
             (new_delta, new_theta) is the normalized bi-sequence of (delta, theta).
             The boolean `notchanged` is True if the bi-sequence (delta, theta)
-            was already normalized, otherwise it is False.
+            was already normalized, otherwise it is False. The empty
+            bi-sequence is normalized: `('', '', True)`.
             
         Examples:
             >>> n = Normalizer012()
@@ -41,51 +271,87 @@ class Normalizer012:
             >>> n.normalize("0102110", "02R0121")
             ('01021102', '02R01201', False)
         """
-        # Checking correct input
-        _check_dt(delta, theta)
+        # Interleaving delta and theta to get only one sequence from two,
+        # stored as the codes of the pairs (delta_i, theta_i)
+        if isinstance(delta, BiSequence):
+            _check_no_theta(theta)
+            original = delta._codes
+            biseq = bytearray(original)
+        else:
+            # Checking correct input
+            delta, theta = _check_dt(delta, theta)
+            original = None
+            biseq = _encode_biseq(delta, theta)
         
         # Changing the letters to be in order 0,1,2
-        delta_t, theta_t, substitution = self._change_letters_order(delta, theta)
-        
-        # Interleaving delta and theta to get only one sequence from two
-        biseq = "".join(d + t for d, t in zip(delta_t, theta_t))
+        biseq, substitution = self._change_letters_order(biseq)
 
         # Initial pre-processing of the prefix
         biseq = self._initial_normalization(biseq)
+        
+        # The result of the same bi-sequence up to the letters
+        key = None
+        if self._cache is not None:
+            key = bytes(biseq)
+            cached = self._cache.get(key)
+            if cached is not None:
+                if self.stats is not None:
+                    self.stats.normalizations = self.stats.normalizations + 1
+                return self._result(cached, substitution, delta, theta, original)
 
         # The main algorithm:
 
         # Creating a rule checker that checks if a normalization rule is applicable
         # and returns its correction.
-        applicable_rule = self._rules_checker.find_applicable_rule(biseq)
+        # The states of the scan are kept for the part of the bi-sequence
+        # preceding the last correction, which is not changed by it.
+        scan = _RulesScan() if self._incremental else None
+        stats = self.stats
+        if stats is not None:
+            stats.normalizations = stats.normalizations + 1
+        applicable_rule = self._rules_checker.find_applicable_rule(biseq, scan, stats)
         
         while applicable_rule:
+            if stats is not None:
+                stats._record(biseq, applicable_rule)
             biseq = self._apply_rule(biseq, applicable_rule);
-            applicable_rule = self._rules_checker.find_applicable_rule(biseq)
+            if scan:
+                scan.rewind(applicable_rule[0])
+            applicable_rule = self._rules_checker.find_applicable_rule(biseq, scan, stats)
 
         # Post-processing
-        new_delta, new_theta = (biseq[0::2], biseq[1::2])
-        logging.info("bi-sequence before changing the letters back: (" + new_delta + ", " + new_theta + ")")
-
-        new_delta, new_theta = self._change_letters_order_back(new_delta, 
-                                                               new_theta, substitution)
+        if self._logger.isEnabledFor(logging.INFO):
+            self._logger.info("bi-sequence before changing the letters back: (%s, %s)", 
+                              *_decode_biseq(biseq))
+        if key is not None:
+            self._cache.put(key, bytes(biseq))
+        return self._result(biseq, substitution, delta, theta, original)
+    
+    def _result(self, biseq, substitution, delta, theta, original):
+        """The tuple returned by normalize for the normalized bi-sequence
+        with the letters in the order 0,1,2."""
+        biseq = self._change_letters_order_back(biseq, substitution)
+        new_delta, new_theta = _decode_biseq(biseq)
         
-        notchanged = (delta == new_delta) and (theta == new_theta)
+        if original is not None:
+            notchanged = (biseq == original)
+        else:
+            notchanged = (delta == new_delta) and (theta == new_theta)
         return (new_delta, new_theta, notchanged)
     
     # Preprocessing
     @staticmethod
-    def _substitute(dic, seq):
-        """Substitutes letters in a word according to rules in the dictionary
-        dic. If there is no rule for the letter, keeps the letter.
+    def _substitute(dic, biseq):
+        """Substitutes letters in a bi-sequence (codes of the pairs) according
+        to rules in the dictionary dic. If there is no rule for the letter, 
+        keeps the letter.
         """
-        newseq = ""
-        for l in seq:
-            if l in dic:
-                newseq = newseq + dic[l]
-            else:
-                newseq = newseq + l
-        return newseq
+        key = frozenset(dic.items())
+        if key not in _PAIR_SUBSTITUTIONS:
+            _PAIR_SUBSTITUTIONS[key] = bytes(
+                _PAIR_CODES[dic.get(pair[0], pair[0]) + dic.get(pair[1], pair[1])] 
+                for pair in _PAIRS).ljust(256, b"\xff")
+        return biseq.translate(_PAIR_SUBSTITUTIONS[key])
     
     @staticmethod
     def _compose_substitutions(subs1, subs2):
@@ -100,77 +366,319 @@ class Normalizer012:
                 csub[l] = subs2[l]
         return csub
 
-    def _change_letters_order(self, delta, theta):
-        """Changes (delta, theta) so that the word obtained is the same as the 
-        original one, but the first symbol is 0, the second 1 and the third 2.
+    def _change_letters_order(self, biseq):
+        """Changes the bi-sequence (codes of the pairs) so that the word 
+        obtained is the same as the original one, but the first symbol is 0,
+        the second 1 and the third 2. Returns the new bi-sequence and the
+        substitution of the letters.
         """
         subs = {}
         subs2 = {"2": "1", "1": "2"}
+        if not biseq:
+            return [biseq, subs]
         # changing the first letter to be 0
-        if delta[0] != "0":
-            subs = {delta[0]: "0", "0": delta[0]}
-            delta = self._substitute(subs, delta)
-            theta = self._substitute(subs, theta)
+        first = _PAIRS[biseq[0]][0]
+        if first != "0":
+            subs = {first: "0", "0": first}
+            biseq = self._substitute(subs, biseq)
         i = 0
-        l = len(delta)
+        l = len(biseq)
         
         #changing the second letter to 1
-        while i < l and delta[i] == "0":
-            if theta[i] == "2":
-                return [delta, theta, subs]
-            if theta[i] == "1":
-                delta = self._substitute(subs2, delta)
-                theta = self._substitute(subs2, theta)            
-                return [delta, theta, self._compose_substitutions(subs, subs2)]
+        while i < l and _PAIRS[biseq[i]][0] == "0":
+            if _PAIRS[biseq[i]][1] == "2":
+                return [biseq, subs]
+            if _PAIRS[biseq[i]][1] == "1":
+                biseq = self._substitute(subs2, biseq)
+                return [biseq, self._compose_substitutions(subs, subs2)]
             i = i + 1
             
-        if i < l and delta[i] == "2":
-            delta = self._substitute(subs2, delta)
-            theta = self._substitute(subs2, theta) 
-            return [delta, theta, self._compose_substitutions(subs, subs2)]
-        return [delta, theta, subs]
-
-    def _change_letters_order_back(self, delta, theta, subs):
-        """Gives back the original letter order to delta and theta that were 
+        if i < l and _PAIRS[biseq[i]][0] == "2":
+            biseq = self._substitute(subs2, biseq)
+            return [biseq, self._compose_substitutions(subs, subs2)]
+        return [biseq, subs]
+
+    def _change_letters_order_back(self, biseq, subs):
+        """Gives back the original letter order to the bi-sequence that was 
         transformed with the substitution subs.
         """
         backsubs = {v:k for k,v in subs.items()}
-        delta = self._substitute(backsubs, delta)
-        theta = self._substitute(backsubs, theta)
-        return [delta, theta]
+        return self._substitute(backsubs, biseq)
     
     @staticmethod
     def _initial_normalization(biseq):
         """Initial preprocessing of the directive bi-sequence so that
         the prefix (i^l, {R,E_i}^l) is (i^l, E_i^l).
         """
-        m = re.match("(0(R|0))+", biseq)
-        if m:
-            biseq = "00"*int((m.end()-m.start())/2) + biseq[m.end():]
+        i = 0
+        while i < len(biseq) and biseq[i] in (_PAIR_CODES["00"], _PAIR_CODES["0R"]):
+            biseq[i] = _PAIR_CODES["00"]
+            i = i + 1
         return biseq
     
     @staticmethod
     def _apply_rule(biseq, correction):
-        """Function that applies the correction in the biseq."""
-        return biseq[:correction[0]] + correction[1] + biseq[correction[0] + 2:]
+        """Function that applies the correction in the biseq (in place)."""
+        biseq[correction[0]:correction[0] + 1] = correction[1]
+        return biseq
     
     def print_all_factor_rules(self):
         """Prints in a readable form all the factor normalization rules"""
-        self._rules_checker.print_all_factor_rules_readable
+        self._rules_checker.print_all_factor_rules_readable()
         
 
+class NormalizationStats:
+    """Counters of the work done by Normalizer012, given to it as `stats`.
+    
+    The counters accumulate over all the calls of normalize. The rules are
+    named "prefix rule n" (n as in the list of the prefix rules) and
+    "factor rule t: rule" (t being the type of the factor rule). Positions
+    and bi-sequences given to the trace are those of the bi-sequence with 
+    the letters in the order 0,1,2, interleaved.
+    
+    Attributes:
+        normalizations (int): The number of bi-sequences normalized.
+        rewrites (int): The number of rules applied.
+        rule_counts (collections.Counter): The number of times each rule 
+            was applied, by its name.
+        prefix_time (float): Seconds spent looking for the prefix rules.
+        factor_time (float): Seconds spent looking for the factor rules.
+        trace (callable): Called as `trace(position, rule, delta, theta)`
+            before each rule is applied on (delta, theta), optional.
+    
+    Examples:
+        >>> stats = NormalizationStats()
+        >>> Normalizer012(stats = stats).normalize("0102110", "02R0121")
+        ('01021102', '02R01201', False)
+        >>> stats.rewrites, dict(stats.rule_counts)
+        (1, {'factor rule 3: 111201': 1})
+    """
+    
+    def __init__(self, trace = None):
+        self.trace = trace
+        self.reset()
+    
+    def reset(self):
+        """Sets all the counters to zero."""
+        self.normalizations = 0
+        self.rewrites = 0
+        self.rule_counts = collections.Counter()
+        self.prefix_time = 0.0
+        self.factor_time = 0.0
+    
+    def as_dict(self):
+        """The counters in a dictionary (e.g., for JSON)."""
+        return {"normalizations": self.normalizations, "rewrites": self.rewrites,
+                "rule_counts": dict(self.rule_counts), "prefix_time": self.prefix_time, 
+                "factor_time": self.factor_time}
+    
+    def __repr__(self):
+        return ("NormalizationStats(normalizations={0}, rewrites={1}, prefix_time={2:.6f}, "
+                "factor_time={3:.6f})".format(self.normalizations, self.rewrites,
+                                              self.prefix_time, self.factor_time))
+    
+    def _record(self, biseq, rule):
+        """Counts the rule [position, correction, name] applied on biseq."""
+        self.rewrites = self.rewrites + 1
+        self.rule_counts[rule[2]] += 1
+        if self.trace is not None:
+            delta, theta = _decode_biseq(biseq)
+            self.trace(rule[0], rule[2], delta, theta)
+
+class _ResultCache:
+    """LRU cache of the normalized bi-sequences (bytes) of Normalizer012,
+    limited to max_size entries and to max_memory bytes (sizes of the keys
+    and values as given by sys.getsizeof) if it is not None."""
+    
+    def __init__(self, max_size, max_memory = None):
+        self.max_size = max_size
+        self.max_memory = max_memory
+        self.clear()
+    
+    def clear(self):
+        """Removes the entries and resets the statistics."""
+        self._entries = collections.OrderedDict()
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key):
+        """The value of the key (marked as the most recently used) or None."""
+        value = self._entries.get(key)
+        if value is None:
+            self.misses = self.misses + 1
+        else:
+            self.hits = self.hits + 1
+            self._entries.move_to_end(key)
+        return value
+    
+    def put(self, key, value):
+        """Adds the entry and removes the least recently used ones over the
+        limits. An entry larger than max_memory is not kept."""
+        size = sys.getsizeof(key) + sys.getsizeof(value)
+        if self.max_memory is not None and size > self.max_memory:
+            return
+        if key in self._entries:
+            self.memory = self.memory - sys.getsizeof(key) - sys.getsizeof(self._entries.pop(key))
+        self._entries[key] = value
+        self.memory = self.memory + size
+        while len(self._entries) > self.max_size or (
+                self.max_memory is not None and self.memory > self.max_memory):
+            old_key, old_value = self._entries.popitem(last = False)
+            self.memory = self.memory - sys.getsizeof(old_key) - sys.getsizeof(old_value)
+    
+    def info(self):
+        return _CacheInfo(self.hits, self.misses, self.max_size, len(self._entries),
+                          self.memory, self.max_memory)
+
+_CacheInfo = collections.namedtuple("CacheInfo", 
+                                    "hits misses maxsize currsize memory maxmemory")
+
+class OnlineNormalizer012:
+    """Object for normalizing a ternary directive bi-sequence given one
+    pair (delta_i, theta_i) at a time.
+    
+    The normalized bi-sequence of a prefix of (delta, theta) is a prefix of
+    the normalized bi-sequence of (delta, theta), so after each pair only
+    the new part is normalized, resuming the search for the rules where
+    it stopped.
+    
+    Examples:
+        >>> on = OnlineNormalizer012()
+        >>> [on.push(d, t) for d, t in zip("0102110", "02R0121")]
+        [('0', '0'), ('1', '2'), ('0', 'R'), ('2', '0'), ('1', '1'), ('1', '2'), ('02', '01')]
+        >>> on.result()
+        ('01021102', '02R01201', False)
+    """
+    
+    def __init__(self):
+        """Initialization of the normalization rules checker."""
+        self._rules_checker = _Normalization012_rules_checker()
+        self._scan = _RulesScan()
+        self._biseq = bytearray()
+        # Substitution of the letters giving the order 0,1,2, it is known
+        # when the first letter different from 0 or the first E_1, E_2 comes
+        self._letters = {"0": "0", "1": "1", "2": "2", "R": "R"}
+        self._ordered = False
+        self._initial = True # still in the prefix (0^l, {R,E_0}^l)
+        self._delta = []
+        self._theta = []
+        self._new_delta = []
+        self._new_theta = []
+        self._compared = 0
+        self._notchanged = True
+    
+    def push(self, d, t):
+        """Adds the pair (d, t) at the end of the directive bi-sequence.
+        
+        Args:
+            d (str): The next letter of delta, '0', '1' or '2'.
+            t (str): The next letter of theta, 'R', '0', '1' or '2'.
+        
+        Returns:
+            The tuple `(delta_part, theta_part)` of the letters added to the
+            normalized bi-sequence, which are not changed by the next pairs.
+        """
+        # Checking correct input
+        if len(d) != 1 or len(t) != 1:
+            raise ValueError("({0}, {1}) is not a pair of letters".format(d, t))
+        _check_ternary(d)
+        _check_theta(t)
+        self._delta.append(d)
+        self._theta.append(t)
+        
+        # Changing the letters to be in order 0,1,2
+        letters = self._letters
+        if len(self._delta) == 1 and d != "0":
+            letters[d], letters["0"] = "0", d
+        if not self._ordered:
+            if letters[d] != "0" or letters[t] in ("1", "2"):
+                self._ordered = True
+                if letters[d] == "2" or (letters[d] == "0" and letters[t] == "1"):
+                    for l in letters:
+                        letters[l] = {"1": "2", "2": "1"}.get(letters[l], letters[l])
+        code = _PAIR_CODES[letters[d] + letters[t]]
+        
+        # Initial pre-processing of the prefix
+        if self._initial:
+            if code in (_PAIR_CODES["00"], _PAIR_CODES["0R"]):
+                code = _PAIR_CODES["00"]
+            else:
+                self._initial = False
+        
+        # Normalization of the new part
+        biseq = self._biseq
+        start = len(biseq)
+        biseq.append(code)
+        applicable_rule = self._rules_checker.find_applicable_rule(biseq, self._scan)
+        while applicable_rule:
+            biseq = Normalizer012._apply_rule(biseq, applicable_rule)
+            self._scan.rewind(applicable_rule[0])
+            applicable_rule = self._rules_checker.find_applicable_rule(biseq, self._scan)
+        
+        # Changing the letters back
+        back = str.maketrans({v: k for k, v in letters.items()})
+        new_delta, new_theta = _decode_biseq(biseq[start:])
+        new_delta, new_theta = new_delta.translate(back), new_theta.translate(back)
+        self._new_delta.extend(new_delta)
+        self._new_theta.extend(new_theta)
+        
+        compared = min(len(self._delta), len(self._new_delta))
+        for i in range(self._compared, compared):
+            if (self._delta[i], self._theta[i]) != (self._new_delta[i], self._new_theta[i]):
+                self._notchanged = False
+        self._compared = compared
+        return (new_delta, new_theta)
+    
+    def result(self):
+        """Normalized bi-sequence of the pairs added so far.
+        
+        Returns:
+            Returns the tuple `(new_delta, new_theta, notchanged)`, as 
+            Normalizer012.normalize for the pairs added so far.
+        """
+        notchanged = self._notchanged and len(self._delta) == len(self._new_delta)
+        return ("".join(self._new_delta), "".join(self._new_theta), notchanged)
+
 class _Normalization012_rules_checker:
     """Checks if some normalization rule is applicable and if so,
     returns its position and correction.   
+    
+    The rules and their automata are built once per process, by the first
+    checker, and shared by all the checkers as class attributes.
     """
     
+    # Attributes made by _generate_factor_rules and _compile_rules, shared
+    # by the checkers
+    _TABLES = ("_ei", "_prefix_rules", "_prefix_corrections", "_prefix_names", 
+               "_prefix_goto", "_prefix_output", "_factor_rules", "_factor_patterns", 
+               "_factor_names", "_goto", "_output")
+    _tables_built = False
+    
     def __init__(self):
         """
-        Preparing and compiling all the normalization rules.
+        Preparing and compiling all the normalization rules (only for the
+        first checker of the process).
         """
-        self._ei = {"0": Ei("0"), "1": Ei("1"), "2": Ei("2")}
-        self._generate_factor_rules()        
-        self._compile_rules()
+        if not _Normalization012_rules_checker._tables_built:
+            self._share_tables(self._build_tables())
+        self._logger = _logger
+    
+    @classmethod
+    def _share_tables(cls, tables):
+        """Sets the tables as attributes of the class."""
+        for name in cls._TABLES:
+            setattr(_Normalization012_rules_checker, name, tables[name])
+        _Normalization012_rules_checker._tables_built = True
+    
+    @classmethod
+    def _build_tables(cls):
+        """Generates the rules and builds their automata."""
+        builder = object.__new__(cls)
+        builder._ei = {"0": Ei("0"), "1": Ei("1"), "2": Ei("2")}
+        builder._generate_factor_rules()
+        builder._compile_rules()
+        return {name: getattr(builder, name) for name in cls._TABLES}
     
     # Regex representing left sides of the prefix normalization rules,
     # their corrections (and the identifier of the rule for information).
@@ -207,69 +715,106 @@ class _Normalization012_rules_checker:
             ("001221(1R11)*1R220020", "211200", 30)
     )
             
-    def find_applicable_rule(self, biseq):
+    def find_applicable_rule(self, biseq, scan = None, stats = None):
         """Finds the next applicable normalization rule in the directive bi-sequence.
         
         Function looking if a prefix rule or a factor rule is applicable inside the
         pre-processed directive bi-sequence and returns the next rule to apply.
 
         Args:
-            biseq (str): Directive bi-sequence (interleaved preprocessed sequences delta
-                and theta).
+            biseq (bytearray): Directive bi-sequence (interleaved preprocessed sequences
+                delta and theta) given by the codes of the pairs (delta_i, theta_i).
+            scan (_RulesScan): States of the previous scan of the bi-sequence, 
+                optional. The search resumes where the scan stopped and the
+                scan is updated.
+            stats (NormalizationStats): Gets the time spent in the search for
+                the prefix rules and for the factor rules, optional.
 
         Returns:
             Returns None if no normalization rule is applicable. If there is, it finds
             the applicable rule on the shortest prefix of the directive bi-sequence 
-            and returns the index and the correction to apply.
+            and returns the index of the pair, the codes of the pairs replacing it
+            and the name of the rule.
         """    
-        logging.info("Checking for an applicable rule in" + str((biseq[0::2], biseq[1::2])))
+        if self._logger.isEnabledFor(logging.INFO):
+            self._logger.info("Checking for an applicable rule in %s", _decode_biseq(biseq))
+        if scan is None:
+            scan = _RulesScan()
+        if stats is not None:
+            return self._timed_find_applicable_rule(biseq, scan, stats)
         
-        applicable_rule = self._find_next_prefix_rule(biseq)
+        applicable_rule = self._find_next_prefix_rule(biseq, scan)
         if applicable_rule:
             return applicable_rule
         
         # If there is no bad prefix, we look for a factor rule
-        applicable_rule = self._find_next_factor_rule(biseq)
+        applicable_rule = self._find_next_factor_rule(biseq, scan)
         if applicable_rule:
             return applicable_rule  
     
-    def _find_next_prefix_rule(self, biseq):
-        """Finds the next applicable prefix normalization rule"""
-        # Looking for a prefix rule
-        for prefix_rule in self._prefix_rules:
-            match = re.match(prefix_rule[0], biseq)
-            if match:
-                logging.info("prefix rule: " + str(prefix_rule))
-                index = match.end() - 2
-                return [index, prefix_rule[1]] # place and correction
-    
-    def _find_next_factor_rule(self, biseq):
+    def _timed_find_applicable_rule(self, biseq, scan, stats):
+        """find_applicable_rule measuring the time of both searches."""
+        start = time.perf_counter()
+        applicable_rule = self._find_next_prefix_rule(biseq, scan)
+        prefix_end = time.perf_counter()
+        stats.prefix_time = stats.prefix_time + prefix_end - start
+        if applicable_rule:
+            return applicable_rule
+        applicable_rule = self._find_next_factor_rule(biseq, scan)
+        stats.factor_time = stats.factor_time + time.perf_counter() - prefix_end
+        if applicable_rule:
+            return applicable_rule
+    
+    def _find_next_prefix_rule(self, biseq, scan):
+        """Finds the next applicable prefix normalization rule, i.e., the first
+        rule (in the order of the rules) matching a prefix of the bi-sequence.
+        
+        The automaton is run until no prefix rule can match anymore.
+        """
+        goto = self._prefix_goto
+        output = self._prefix_output
+        states = scan.prefix_states
+        found = scan.prefix_found
+        state = states[-1]
+        for position in range(len(states) - 1, len(biseq)):
+            if state == _DEAD_STATE:
+                break
+            state = goto[state][biseq[position]]
+            best = found[-1]
+            if output[state] is not None and (best is None or output[state] < best[0]):
+                best = (output[state], position)
+            states.append(state)
+            found.append(best)
+        
+        if found[-1]:
+            index, position = found[-1]
+            self._logger.info("prefix rule: %s", self._prefix_rules[index])
+            # place, correction and name
+            return [position, self._prefix_corrections[index], self._prefix_names[index]]
+    
+    def _find_next_factor_rule(self, biseq, scan):
         """Finds the next applicable factor rule, i.e., the rule that can be 
         applied on the shortest prefix of the directive bi-sequence.
+        
+        The bi-sequence is read pair by pair by the automaton, so that only
+        the occurrences of the rules at even positions are found.
         """
-        matches = []
-        for rules_index,_rules in self._factor_rules.items():
-            for rule in _rules:
-                match = re.match(rule, biseq)
-                if match:
-                    logging.info("rule" + str(rules_index) + ": " + str(self._print_factor_rule(rule)) +
-                    " in biseq " + str((biseq[0::2], biseq[1::2])))
-                    
-                    position = match.end() - 2 # The position to be corrected
-                    #Index of match and correction:
-                    matches.append([position, self._factor_rules_replacement(rules_index, match.group(2))])
-                    biseq = biseq[:position + 3]
-
-        logging.debug("all non-prefix matches: " + str(matches))
-        
-        # Finding final factor rule (leftmost)
-        if matches:
-            final = matches[0]
-            for rule in matches[1:]:
-                if rule[0] < final[0]:
-                    final = rule
-            logging.debug("Final change:" + str(final))
-            return final 
+        goto = self._goto
+        output = self._output
+        states = scan.factor_states
+        state = states[-1]
+        for position in range(len(states) - 1, len(biseq)):
+            state = goto[state][biseq[position]]
+            if output[state] is None:
+                states.append(state)
+            else:
+                rules_index, rule, correction = self._factor_patterns[output[state]]
+                if self._logger.isEnabledFor(logging.INFO):
+                    self._logger.info("rule%s: %s in biseq %s", rules_index, 
+                                      self._print_factor_rule(rule), _decode_biseq(biseq))
+                    self._logger.debug("Final change: %s", [position, _decode_biseq(correction)])
+                # place, correction and name
+                return [position, correction, self._factor_names[output[state]]]
     
     def _factor_rules_replacement(self, index, rule):
         """Finds the correction for a given factor rule, depending
@@ -286,7 +831,7 @@ class _Normalization012_rules_checker:
         elif index == 4:
             return rule[6]+rule[1]+rule[2]+rule[3]+rule[4] + rule[5]
         else:
-            logging.error("No correction found.")
+            _logger.error("No correction found.")
     
     def _generate_factor_rules(self):
         """Creates all possible factor rules (of type 1, 2, 3 and 4)"""
@@ -312,19 +857,149 @@ class _Normalization012_rules_checker:
                     ei[k[1][2]][int(ei[k[1][0]][int(k[0][1])])] + k[1][2]
                  for k in itertools.product(a_b, ijk))
     def _compile_rules(self):
-        """Compiles de regexes of all the normalization rules."""
-        self._prefix_rules = tuple((re.compile(rule[0]),rule[1],rule[2])
-                                   for rule in self._bad_prefixes_and_correction)
+        """Compiles the prefix rules and the factor rules into automata."""
+        self._prefix_rules = self._bad_prefixes_and_correction
+        self._prefix_corrections = tuple(bytes(_encode_biseq(rule[1][0::2], rule[1][1::2]))
+                                         for rule in self._prefix_rules)
+        self._prefix_names = tuple("prefix rule {}".format(rule[2]) for rule in self._prefix_rules)
+        self._build_prefix_automaton()
 
         self._factor_rules = {}
-        self._factor_rules[1] = tuple( re.compile('^([012R]{2})*('+ rule + ')')
-                                      for rule in self._rules1 )
-        self._factor_rules[2] = tuple( re.compile('^([012R]{2})*('+ rule + ')')
-                                      for rule in self._rules2 )
-        self._factor_rules[3] = tuple( re.compile('^([012R]{2})*('+ rule + ')')
-                                      for rule in self._rules3 )
-        self._factor_rules[4] = tuple( re.compile('^([012R]{2})*('+ rule + ')')
-                                      for rule in self._rules4 )
+        self._factor_rules[1] = tuple(self._rules1)
+        self._factor_rules[2] = tuple(self._rules2)
+        self._factor_rules[3] = tuple(self._rules3)
+        self._factor_rules[4] = tuple(self._rules4)
+        
+        # Factor rules in the order of their priority when several of them
+        # end at the same position, together with their corrections
+        self._factor_patterns = tuple(
+            (index, rule, bytes(_encode_biseq(correction[0::2], correction[1::2])))
+            for index, rules in self._factor_rules.items() for rule in rules
+            for correction in [self._factor_rules_replacement(index, rule)])
+        self._factor_names = tuple("factor rule {0}: {1}".format(index, rule)
+                                   for index, rule, _ in self._factor_patterns)
+        self._build_factor_automaton()
+    
+    def _build_prefix_automaton(self):
+        """Builds the deterministic automaton of the prefix rules over the
+        alphabet of the pairs (delta_i, theta_i).
+        
+        The regexes of the prefix rules are made only of pairs, groups, 
+        `*` and `+`. They are translated into one nondeterministic automaton
+        which is then determinized. `self._prefix_goto[state][code]` is the 
+        next state (0 is the initial state and `_DEAD_STATE` the state from
+        which no rule can match) and `self._prefix_output[state]` is the index
+        of the first prefix rule matching a prefix ending in the state, or None.
+        """
+        moves = [] # moves[node]: list of (code, node), code None for empty moves
+        
+        def new_node():
+            moves.append([])
+            return len(moves) - 1
+        
+        def sequence(pattern, pos):
+            """Automaton of the sequence starting at pattern[pos] and ending
+            at the end of the pattern or of the group."""
+            start = end = new_node()
+            while pos < len(pattern) and pattern[pos] != ")":
+                if pattern[pos] == "(":
+                    first, last, pos = sequence(pattern, pos + 1)
+                    pos = pos + 1
+                else:
+                    first, last = new_node(), new_node()
+                    moves[first].append((_PAIR_CODES[pattern[pos:pos + 2]], last))
+                    pos = pos + 2
+                if pos < len(pattern) and pattern[pos] in "*+":
+                    moves[last].append((None, first))
+                    if pattern[pos] == "*":
+                        moves[first].append((None, last))
+                    pos = pos + 1
+                moves[end].append((None, first))
+                end = last
+            return start, end, pos
+        
+        initial = new_node()
+        accepting = {}
+        for index, rule in enumerate(self._prefix_rules):
+            first, last, _ = sequence(rule[0], 0)
+            moves[initial].append((None, first))
+            accepting[last] = index
+        
+        def closure(nodes):
+            stack = list(nodes)
+            reached = set(nodes)
+            while stack:
+                for code, node in moves[stack.pop()]:
+                    if code is None and node not in reached:
+                        reached.add(node)
+                        stack.append(node)
+            return frozenset(reached)
+        
+        # Subset construction
+        subsets = [closure([initial]), frozenset()]
+        numbers = {subsets[0]: 0, subsets[_DEAD_STATE]: _DEAD_STATE}
+        goto = []
+        for subset in subsets:
+            goto.append([])
+            for code in range(len(_PAIRS)):
+                target = closure([node for n in subset for c, node in moves[n] if c == code])
+                if target not in numbers:
+                    numbers[target] = len(subsets)
+                    subsets.append(target)
+                goto[-1].append(numbers[target])
+        
+        self._prefix_goto = goto
+        self._prefix_output = [min((accepting[n] for n in subset if n in accepting), default = None)
+                               for subset in subsets]
+    
+    def _build_factor_automaton(self):
+        """Builds the Aho-Corasick automaton of the factor rules over the
+        alphabet of the pairs (delta_i, theta_i).
+        
+        `self._goto[state][code]` is the next state after reading the pair
+        with the code `code` and `self._output[state]` is the index (in
+        `self._factor_patterns`) of the first rule ending in the state,
+        or None.
+        """
+        goto = [[None]*len(_PAIRS)]
+        output = [None]
+        
+        # Trie of the rules
+        for order, (_, rule, _) in enumerate(self._factor_patterns):
+            state = 0
+            for k in range(0, len(rule), 2):
+                code = _PAIR_CODES[rule[k:k + 2]]
+                if goto[state][code] is None:
+                    goto[state][code] = len(goto)
+                    goto.append([None]*len(_PAIRS))
+                    output.append(None)
+                state = goto[state][code]
+            if output[state] is None:
+                output[state] = order
+        
+        # Failure links (breadth-first), completing the transitions
+        fail = [0]*len(goto)
+        queue = collections.deque()
+        for code in range(len(_PAIRS)):
+            if goto[0][code] is None:
+                goto[0][code] = 0
+            else:
+                queue.append(goto[0][code])
+        while queue:
+            state = queue.popleft()
+            f = fail[state]
+            if output[f] is not None and (output[state] is None or output[f] < output[state]):
+                output[state] = output[f]
+            for code in range(len(_PAIRS)):
+                nxt = goto[state][code]
+                if nxt is None:
+                    goto[state][code] = goto[f][code]
+                else:
+                    fail[nxt] = goto[f][code]
+                    queue.append(nxt)
+        
+        self._goto = goto
+        self._output = output
     
     def print_all_factor_rules_readable(self):
         """Prints all the factor rules"""
@@ -341,15 +1016,44 @@ class _Normalization012_rules_checker:
                                   
     def _print_factor_rule(self, rule):
         """Prints a readable factor rule"""
-        rule_from_regex = rule.pattern.split("*")[1][1:-1]
-        return (rule_from_regex[0::2], rule_from_regex[1::2])
+        return (rule[0::2], rule[1::2])
+
+class _RulesScan:
+    """States of the automata of the normalization rules before each pair
+    of a bi-sequence, kept between two searches for an applicable rule.
+    """
+    
+    def __init__(self):
+        self.prefix_states = [0]
+        # first prefix rule (index, position) found before each pair
+        self.prefix_found = [None]
+        self.factor_states = [0]
+    
+    def rewind(self, position):
+        """Forgets the states after the pair at the index `position` in the 
+        bi-sequence, i.e., the states that may be changed by a correction
+        at this position.
+        """
+        del self.prefix_states[position + 1:]
+        del self.prefix_found[position + 1:]
+        del self.factor_states[position + 1:]
 
 class NaiveNormalizer012:
     """Object for normalizing ternary directive bi-sequences using
     a naive algorithm.
     """
+    
+    def __init__(self, backend = "python"):
+        """Initialization of the naive normalizer.
         
-    def normalize(self, delta, theta):
+        Args:
+            backend (str): "python", or "numpy" to make the closures on 
+                arrays of letters (requires NumPy).
+        """
+        _check_backend(backend)
+        self.backend = backend
+        
+    def normalize(self, delta, theta = None):
         """Ternary naive normalization algorithm.
         
         Naive normalization function that returns the normalized 
@@ -361,6 +1065,7 @@ class NaiveNormalizer012:
         Args:
             delta (str): The sequence delta of the directive bi-sequence.
                 It should be composed of the letters '0', '1' and '2'.
+                It can also be a BiSequence, then theta is not given.
             theta (str): The sequence theta of the directive bi-sequence.
                 It should be composed from the letters 'R', '0', '1' and
                 '2', where the last three stand for E_0, E_1 and E_2. Theta
@@ -380,60 +1085,719 @@ class NaiveNormalizer012:
             ('01021102', '02R01201', False)
         """
         # Checking correct input
-        _check_dt(delta, theta)
+        delta, theta = _checked_dt(delta, theta)
                          
         w = ""
-        l=1
-        prefixes = []
         
-        # Creating the pseudopalindromic prefixes w_i
-        for step in range(0,len(delta)):
-            w = w + delta[step]
-            if theta[step] == "R":
-                w = make_pal_closure(w)
-            elif theta[step] in ["0", "1", "2"]:
-                w = make_eipal_closure(w, theta[step])
-            else:
-                logging.error("wrong symbol")
-                return
-            prefixes.append(w)
-        logging.info("Prefixes from (delta, theta): " + str(prefixes))
-        logging.info("Obtained word: " + w)
+        # Creating the pseudopalindromic prefixes w_i by closures
+        if self.backend == "numpy":
+            w = _from_array(_numpy_word012(delta, theta, closures = True))
+        else:
+            for step, w in enumerate(_iter_prefixes(delta, theta, closures = True)):
+                _logger.info("Prefix w%s from (delta, theta): %s", step+1, w)
+        _logger.info("Obtained word: %s", w)
         
         # Finding all the pseudopalindromic prefixes of the word obtained
-        newdelta = delta[0]
+        newdelta = delta[:1]
         newtheta = ""
-        while l <= len(w):
-            prefix = w[:l]
-            res = self._test_palindromicity(prefix)
-            if res[0] == True:
-                logging.info(prefix)
+        types = self._pseudopalindromic_prefixes(w)
+        for l in range(1, len(w) + 1):
+            if types[l] is not None:
+                _logger.info("%s", w[:l])
                 if l < len(w):
                     newdelta = newdelta + w[l]
-                newtheta = newtheta + res[1]           
-            l=l+1
+                newtheta = newtheta + types[l]
             
         if newdelta == delta and newtheta == theta:
             return (newdelta, newtheta, True)
         else:
             return (newdelta, newtheta, False)
         
+    def first_change(self, delta, theta = None):
+        """The index of the first pair of the directive bi-sequence changed
+        by the naive normalization, or None if it is normalized.
+        
+        The prefixes w_k are made one after another and the search stops at
+        the first pseudopalindromic prefix not matching the bi-sequence, so 
+        only the prefixes up to it are made. Only the last prefix is kept.
+        
+        Examples:
+            >>> nn = NaiveNormalizer012()
+            >>> nn.first_change("0102110", "02R0121"), nn.first_change("0011", "00RR")
+            (6, None)
+        """
+        delta, theta = _checked_dt(delta, theta)
+        # The pair i of the normalized bi-sequence is (w[l_i], type of w[:l_{i+1}])
+        # where l_0 = 0 and l_1 < l_2 < ... are the lengths of the 
+        # pseudopalindromic prefixes of w
+        i = 0
+        last = 0
+        for w in _iter_prefixes(delta, theta, closures = True):
+            types = self._pseudopalindromic_prefixes(w)
+            for l in range(last + 1, len(w) + 1):
+                t = types[l]
+                if t is None:
+                    continue
+                if i == len(delta) or (w[last], t) != (delta[i], theta[i]):
+                    return i
+                i = i + 1
+                last = l
+        return None
+    
     @staticmethod
-    def _test_palindromicity(seq):
-        """Checks if a seq is an palindrome or an Ei-palindrome and 
-        returns its nature. Note that the word ii..i is considered 
-        here as an E_i palindrome.
+    def _pseudopalindromic_prefixes(seq):
+        """Finds the nature of every pseudopalindromic prefix of seq in linear
+        time. Returns the list `types` where types[l] is "0", "1", "2" or "R"
+        if seq[:l] is an E_0, E_1, E_2-palindrome or a palindrome (in this
+        order of priority, so that the word ii..i is considered here as an 
+        E_i palindrome), and None otherwise.
+        
+        The prefix of length l is a pseudopalindrome if and only if it is a
+        suffix of the image of seq by the antimorphism. The longest such 
+        prefix is found by the Knuth-Morris-Pratt algorithm looking for seq 
+        in the image, the other ones are its borders given by the failure 
+        function, which is computed only once.
         """
-        if is_eipal(seq,0):
-            return [True, "0"]
-        elif is_eipal(seq, 1):
-            return [True, "1"]
-        elif is_eipal(seq, 2):
-            return [True, "2"]
-        elif is_pal(seq):
-            return [True, "R"]
-        else:
-            return [False]
+        fail = _failure_function(seq)
+        types = [None]*(len(seq) + 1)
+        for t in "R210":
+            image = seq[::-1].translate(_TRANSLATIONS[t])
+            l = _longest_pseudopal_suffix(image, seq, fail)
+            while l > 0:
+                types[l] = t
+                l = fail[l]
+        return types
+
+class GPSWord:
+    """A ternary GPS word given by (delta, theta), with access to its letters
+    without making the word.
+    
+    Only the lengths of the prefixes w_k of the normalized bi-sequence are
+    stored. A letter is found by going down through the pseudopalindromic
+    closures, applying the antimorphisms on the way, so the word can be
+    far longer than the memory.
+    
+    Examples:
+        >>> w = GPSWord("0011", "012R")
+        >>> len(w)
+        11
+        >>> w[3], w[-1], w[2:6]
+        ('2', '0', '2211')
+        >>> w = GPSWord("0121"*30, "R012"*30)
+        >>> w.length
+        140985115568122853572316982
+        >>> w[10**20:10**20 + 12]
+        '121020210120'
+    """
+    
+    # The length of the prefix of the word kept by _short_prefix
+    _SHORT_PREFIX = 1 << 16
+    
+    def __init__(self, delta, theta = None):
+        """Computes the closure structure of the word.
+        
+        Args:
+            delta (str): The sequence delta of the directive bi-sequence,
+                composed of the letters '0', '1' and '2'.
+                It can also be a BiSequence, then theta is not given.
+            theta (str): The sequence theta of the directive bi-sequence,
+                composed from the letters 'R', '0', '1' and '2', where 
+                the last three stand for E_0, E_1 and E_2. Must have the 
+                same length as delta.
+        """
+        # Checking correct input
+        delta, theta = _checked_dt(delta, theta)
+        self.delta = delta
+        self.theta = theta
+        
+        # w_k = w_{k-1}letter + antimorphism((w_{k-1}letter)[:mirrored]) 
+        # for the normalized bi-sequence
+        self._lengths = [0]
+        self._letters = [""]
+        self._antimorphisms = [""]
+        self._mirrored = [0]
+        prefix_lengths = []
+        if delta:
+            new_delta, new_theta, _ = _get_internal_normalizer().normalize(delta, theta)
+            for letter, antimorphism, mirrored, length, palindromes in (
+                    _recurrence_steps(new_delta, new_theta)):
+                self._lengths.append(length)
+                self._letters.append(letter)
+                self._antimorphisms.append(antimorphism)
+                self._mirrored.append(mirrored)
+                if len(prefix_lengths) < len(theta) and theta[len(prefix_lengths)] in palindromes:
+                    prefix_lengths.append(length)
+        self.prefix_lengths = tuple(prefix_lengths)
+        self.length = self._lengths[-1]
+        self._prefix = None
+    
+    def __len__(self):
+        """The length of the word (use the attribute `length` for words
+        longer than sys.maxsize)."""
+        return self.length
+    
+    def __repr__(self):
+        return "GPSWord({0!r}, {1!r})".format(self.delta, self.theta)
+    
+    def __getitem__(self, index):
+        """The letter at the index or the factor given by a slice."""
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.length)
+            if step == 1:
+                return self._factor(len(self._lengths) - 1, start, max(start, stop))
+            return "".join(self._letter(i) for i in range(start, stop, step))
+        if index < 0:
+            index = index + self.length
+        if not 0 <= index < self.length:
+            raise IndexError("GPSWord index out of range")
+        return self._letter(index)
+    
+    def _letter(self, index):
+        """The letter of the word at the index."""
+        lengths = self._lengths
+        # the letters permutation applied to the letter found
+        permutation = "012"
+        k = len(lengths) - 1
+        while True:
+            # The shortest prefix w_k containing the index
+            k = bisect.bisect_right(lengths, index, 0, k + 1)
+            if index == lengths[k-1]:
+                return permutation[int(self._letters[k])]
+            # The letter is the image of the letter in (w_{k-1}letter)[:mirrored]
+            index = self._mirrored[k] - 1 - (index - lengths[k-1] - 1)
+            if self._antimorphisms[k] != "R":
+                ei = Ei(self._antimorphisms[k])
+                permutation = "".join(permutation[int(ei[l])] for l in range(3))
+    
+    def _factor(self, k, start, stop):
+        """The factor w_k[start:stop].
+        
+        The parts of the factor are written from a stack (not recursively,
+        there is a level for every closure): letters, or tuples `(k, start,
+        stop, reverse, permutation)` standing for w_k[start:stop], reversed
+        if reverse, with every letter l written as permutation[l].
+        """
+        prefix = self._short_prefix()
+        letters = []
+        stack = [(k, start, stop, False, "012")]
+        while stack:
+            part = stack.pop()
+            if isinstance(part, str):
+                letters.append(part)
+                continue
+            k, start, stop, reverse, permutation = part
+            if start >= stop:
+                continue
+            if stop <= len(prefix):
+                factor = prefix[start:stop]
+                if permutation != "012":
+                    factor = factor.translate(str.maketrans("012", permutation))
+                letters.append(factor[::-1] if reverse else factor)
+                continue
+            # The shortest prefix w_k containing the factor
+            k = bisect.bisect_left(self._lengths, stop, 0, k + 1)
+            base = self._lengths[k-1]
+            parts = []
+            if start < base:
+                parts.append((k - 1, start, base, reverse, permutation))
+                start = base
+            if start == base:
+                parts.append(permutation[int(self._letters[k])])
+                start = start + 1
+            if start < stop:
+                # The image of the factor [first:last] of (w_{k-1}letter)[:mirrored],
+                # i.e., the image of the letter (if last > base) followed by 
+                # the reversed image of w_{k-1}[first:min(last, base)]
+                first = self._mirrored[k] - (stop - base - 1)
+                last = self._mirrored[k] - (start - base - 1)
+                translation = _TRANSLATIONS[self._antimorphisms[k]]
+                image = "".join(permutation[int(l.translate(translation))] for l in "012")
+                if last > base:
+                    parts.append(image[int(self._letters[k])])
+                parts.append((k - 1, first, min(last, base), not reverse, image))
+            if reverse:
+                parts.reverse()
+            stack.extend(reversed(parts))
+        return "".join(letters)
+    
+    def _short_prefix(self):
+        """The longest prefix w_k of at most _SHORT_PREFIX letters, made on
+        the first call, from which the short factors are copied."""
+        if self._prefix is None:
+            w = ""
+            for k in range(1, len(self._lengths)):
+                if self._lengths[k] > self._SHORT_PREFIX:
+                    break
+                w = w + self._letters[k]
+                w = w + w[:self._mirrored[k]][::-1].translate(_TRANSLATIONS[self._antimorphisms[k]])
+            self._prefix = w
+        return self._prefix
+
+class PalindromeIndex:
+    """Answers queries about the pseudopalindromic factors of a ternary word
+    without rescanning them.
+    
+    For every antimorphism (R, E_0, E_1 and E_2) and every center of the 
+    word, the length of the longest pseudopalindrome with this center is 
+    computed once by the Manacher algorithm. A factor w[start:stop] is then a
+    pseudopalindrome if and only if the one of its center is long enough,
+    which is checked in O(1). The longest pseudopalindromic suffix or prefix
+    of a factor is found in O(log n) by a sparse table built on the first 
+    such query.
+    
+    The antimorphism is given as in theta: "R", "0", "1" or "2"; None stands
+    for any of them. The word ii..i is considered as an E_i-palindrome and
+    as a palindrome.
+    
+    Examples:
+        >>> index = PalindromeIndex("0102010")
+        >>> index.is_pal(0, 7), index.is_eipal(1, 4, 0), index.is_eipal(1, 4, 1)
+        (True, True, False)
+        >>> index.longest_pseudopal_suffix(0, 6, "R")
+        5
+        >>> index.longest_pseudopal_prefix(1, 7)
+        5
+        >>> index.pseudopal_type(1, 4)
+        '0'
+    """
+    
+    def __init__(self, word):
+        """Computes the radii of the pseudopalindromes of the word.
+        
+        Args:
+            word (str): The word indexed, composed of the letters "0", "1" 
+                and "2".
+        """
+        # Checking correct input
+        _check_ternary(word)
+        self.word = word
+        self._radii = {t: self._pseudopal_radii(word, _TRANSLATIONS[t]) 
+                       for t in "012R"}
+        self._suffix_tables = {}
+        self._prefix_tables = {}
+    
+    def __len__(self):
+        return len(self.word)
+    
+    def __repr__(self):
+        return "PalindromeIndex({0!r})".format(self.word)
+    
+    @staticmethod
+    def _pseudopal_radii(word, translation):
+        """Manacher algorithm for the antimorphism given by the translation.
+        
+        The factor word[start:stop] has the center start + stop. Returns the
+        list `radii` where radii[center] is the length of the longest 
+        pseudopalindrome with this center, or -1 if there is none (a letter
+        which is not fixed by the antimorphism).
+        """
+        # The word with separators, the factor word[start:stop] is 
+        # t[2*start:2*stop + 1] and its length is the radius in t
+        t = "#" + "#".join(word) + "#"
+        image = t.translate(translation)
+        n = len(t)
+        radii = [0]*n
+        center = right = 0
+        for i in range(n):
+            if t[i] != image[i]:
+                radii[i] = -1
+                continue
+            k = 0
+            if i < right:
+                k = min(radii[2*center - i], right - i)
+            while i - k > 0 and i + k + 1 < n and t[i-k-1] == image[i+k+1]:
+                k = k + 1
+            radii[i] = k
+            if i + k > right:
+                center, right = i, i + k
+        return radii
+    
+    def _indices(self, start, stop):
+        if stop is None:
+            stop = len(self.word)
+        start, stop, _ = slice(start, stop).indices(len(self.word))
+        return start, max(start, stop)
+    
+    def _antimorphisms(self, antimorphism):
+        if antimorphism is None:
+            return "012R"
+        if antimorphism not in self._radii:
+            raise ValueError("{} is not in {{R,0,1,2}}".format(antimorphism))
+        return antimorphism
+    
+    def is_pseudopal(self, start=0, stop=None, antimorphism=None):
+        """Checks if the factor word[start:stop] is a pseudopalindrome for 
+        the antimorphism ("R", "0", "1", "2" or None for any of them)."""
+        start, stop = self._indices(start, stop)
+        return any(self._radii[t][start + stop] >= stop - start 
+                   for t in self._antimorphisms(antimorphism))
+    
+    def is_pal(self, start=0, stop=None):
+        """Checks if the factor word[start:stop] is a palindrome."""
+        return self.is_pseudopal(start, stop, "R")
+    
+    def is_eipal(self, start, stop, i):
+        """Checks if the factor word[start:stop] is an Ei-palindrome."""
+        return self.is_pseudopal(start, stop, str(i))
+    
+    def pseudopal_type(self, start=0, stop=None):
+        """The type of the pseudopalindrome word[start:stop] as in theta, with
+        the priority E_0, E_1, E_2, R, or None if it is not one."""
+        start, stop = self._indices(start, stop)
+        for t in "012R":
+            if self._radii[t][start + stop] >= stop - start:
+                return t
+        return None
+    
+    def longest_pseudopal_suffix(self, start=0, stop=None, antimorphism=None):
+        """Length of the longest pseudopalindromic suffix of word[start:stop]
+        for the antimorphism ("R", "0", "1", "2" or None for any of them)."""
+        start, stop = self._indices(start, stop)
+        longest = 0
+        for t in self._antimorphisms(antimorphism):
+            # The suffix word[s:stop] is a pseudopalindrome iff its center 
+            # c = s + stop satisfies c + radii[c] >= 2*stop, the first such
+            # center gives the longest one
+            if t not in self._suffix_tables:
+                radii = self._radii[t]
+                self._suffix_tables[t] = _sparse_table(
+                    [c + r for c, r in enumerate(radii)], max)
+            table = self._suffix_tables[t]
+            c = start + stop
+            for level in reversed(range(len(table))):
+                if c + (1 << level) <= 2*stop and table[level][c] < 2*stop:
+                    c = c + (1 << level)
+            longest = max(longest, 2*stop - c)
+        return longest
+    
+    def longest_pseudopal_prefix(self, start=0, stop=None, antimorphism=None):
+        """Length of the longest pseudopalindromic prefix of word[start:stop]
+        for the antimorphism ("R", "0", "1", "2" or None for any of them)."""
+        start, stop = self._indices(start, stop)
+        longest = 0
+        for t in self._antimorphisms(antimorphism):
+            # The prefix word[start:e] is a pseudopalindrome iff its center 
+            # c = start + e satisfies c - radii[c] <= 2*start, the last such
+            # center gives the longest one
+            if t not in self._prefix_tables:
+                radii = self._radii[t]
+                self._prefix_tables[t] = _sparse_table(
+                    [c - r for c, r in enumerate(radii)], min)
+            table = self._prefix_tables[t]
+            c = start + stop
+            for level in reversed(range(len(table))):
+                if (c - (1 << level) >= 2*start 
+                        and table[level][c - (1 << level) + 1] > 2*start):
+                    c = c - (1 << level)
+            longest = max(longest, c - 2*start)
+        return longest
+
+class PackedWord:
+    """A ternary word stored in a file with 2 bits per letter, read through
+    a memory mapping.
+    
+    The file has a header of 16 bytes (the magic bytes and the length of the
+    word as an unsigned little-endian integer of 8 bytes) followed by the
+    letters, four per byte from the lowest bits. `PackedWord.build` writes
+    the GPS word of a directive bi-sequence, so that words longer than the
+    memory can be made and opened later without making them again.
+    
+    Examples:
+        >>> import os, tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), "word.tgpc")
+        >>> with PackedWord.build(path, "0011", "012R") as w:
+        ...     len(w), w[3], w[:]
+        (11, '2', '00221112200')
+        >>> with PackedWord(path) as w:
+        ...     w[2:6], bytes(w.packed)
+        ('2211', b'\\xa0\\x95\\x02')
+    """
+    
+    _MAGIC = b"TGPCWRD\x01"
+    _HEADER = 16
+    # Number of letters read and written at once while building the word
+    _CHUNK = 1 << 22
+    
+    def __init__(self, path):
+        """Opens the packed word stored in the file (read only).
+        
+        Args:
+            path (str): The path of the file made by `PackedWord.build`.
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            header = self._file.read(self._HEADER)
+            if len(header) != self._HEADER or header[:8] != self._MAGIC:
+                raise ValueError("{} is not a packed word".format(path))
+            self.length = int.from_bytes(header[8:], "little")
+            size = self._HEADER + (self.length + 3)//4
+            if os.fstat(self._file.fileno()).st_size < size:
+                raise ValueError("{} is truncated".format(path))
+            self._mapping = mmap.mmap(self._file.fileno(), size, access = mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+    
+    @classmethod
+    def build(cls, path, delta, theta = None, chunk = None):
+        """Writes the GPS word of (delta, theta) in the file and opens it.
+        
+        The prefixes w_k of the normalized bi-sequence are made one after 
+        the other in the mapping of the file, the image of the beginning of
+        the word being read from the part already written, by chunks.
+        
+        Args:
+            path (str): The path of the file, replaced if it exists.
+            delta (str): The sequence delta of the directive bi-sequence,
+                composed of the letters '0', '1' and '2'.
+                It can also be a BiSequence, then theta is not given.
+            theta (str): The sequence theta of the directive bi-sequence,
+                composed from the letters 'R', '0', '1' and '2', where 
+                the last three stand for E_0, E_1 and E_2. Must have the 
+                same length as delta.
+            chunk (int): The number of letters read and written at once, 
+                optional.
+        
+        Returns:
+            The PackedWord of the file.
+        """
+        delta, theta = _checked_dt(delta, theta)
+        chunk = max(4, (chunk or cls._CHUNK)//4*4)
+        steps = []
+        if delta:
+            new_delta, new_theta, _ = _get_internal_normalizer().normalize(delta, theta)
+            steps = list(_recurrence_steps(new_delta, new_theta))
+        length = steps[-1][3] if steps else 0
+        size = cls._HEADER + (length + 3)//4
+        
+        with open(path, "w+b") as word_file:
+            word_file.truncate(size)
+            word_file.write(cls._MAGIC + length.to_bytes(8, "little"))
+            word_file.flush()
+            with mmap.mmap(word_file.fileno(), size) as mapping:
+                end = 0
+                for letter, antimorphism, mirrored, step_length, _ in steps:
+                    cls._write(mapping, end, bytes([int(letter)]))
+                    end = end + 1
+                    # w[end:step_length] is the image of w[:mirrored] 
+                    table = _LETTER_IMAGES[antimorphism]
+                    for start in range(0, mirrored, chunk):
+                        source = max(0, mirrored - start - chunk)
+                        letters = cls._read(mapping, source, mirrored - start)
+                        cls._write(mapping, end + start, letters[::-1].translate(table))
+                    end = step_length
+                mapping.flush()
+        return cls(path)
+    
+    @classmethod
+    def _read(cls, mapping, start, stop):
+        """The letters [start:stop] (values 0, 1, 2) of the mapping."""
+        first, last = start//4, (stop + 3)//4
+        packed = mapping[cls._HEADER + first:cls._HEADER + last]
+        letters = bytearray(4*len(packed))
+        for shift in range(4):
+            letters[shift::4] = packed.translate(_UNPACK_TABLES[shift])
+        return bytes(letters[start - 4*first:stop - 4*first])
+    
+    @classmethod
+    def _write(cls, mapping, start, letters):
+        """Writes the letters (values 0, 1, 2) from the position start in the
+        mapping, where the letters are still 0."""
+        i = 0
+        while i < len(letters) and (start + i) % 4:
+            position = cls._HEADER + (start + i)//4
+            mapping[position] = mapping[position] | letters[i] << 2*((start + i) % 4)
+            i = i + 1
+        full = (len(letters) - i)//4
+        if full:
+            # The letters of the bytes, shifted, are combined as big integers
+            group = letters[i:i + 4*full]
+            value = 0
+            for shift in range(4):
+                value = value | int.from_bytes(group[shift::4].translate(_PACK_TABLES[shift]), "little")
+            position = cls._HEADER + (start + i)//4
+            mapping[position:position + full] = value.to_bytes(full, "little")
+            i = i + 4*full
+        while i < len(letters):
+            position = cls._HEADER + (start + i)//4
+            mapping[position] = mapping[position] | letters[i] << 2*((start + i) % 4)
+            i = i + 1
+    
+    @property
+    def packed(self):
+        """A memoryview of the packed letters in the mapping (without copy),
+        to be released before closing the word."""
+        return memoryview(self._mapping)[self._HEADER:]
+    
+    def __len__(self):
+        """The length of the word."""
+        return self.length
+    
+    def __repr__(self):
+        return "PackedWord({!r})".format(self.path)
+    
+    def __getitem__(self, index):
+        """The letter at the index or the factor given by a slice."""
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.length)
+            if step != 1:
+                return "".join(self[i] for i in range(start, stop, step))
+            if start >= stop:
+                return ""
+            return self._read(self._mapping, start, stop).translate(_LETTERS_OF_VALUES).decode()
+        if index < 0:
+            index = index + self.length
+        if not 0 <= index < self.length:
+            raise IndexError("PackedWord index out of range")
+        return "012"[self._mapping[self._HEADER + index//4] >> 2*(index % 4) & 3]
+    
+    def close(self):
+        """Closes the mapping and the file."""
+        self._mapping.close()
+        self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+class FactorIndex:
+    """Index of the factors of a ternary word (suffix automaton).
+    
+    The automaton is built in one pass over the word, it has less than
+    2*len(word) states. The queries on a factor u (is it a factor, number 
+    of occurrences, first occurrence) take a time proportional to |u|, and
+    the factor complexity is given without enumerating the factors: the 
+    factors ending in a state have the lengths between the length of its
+    suffix link (excluded) and its own length.
+    
+    Examples:
+        >>> index = FactorIndex(make_word012("0011", "012R"))
+        >>> "2211" in index, "0000" in index
+        (True, False)
+        >>> index.count("22"), index.find("22"), index.find("1120")
+        (2, 2, -1)
+        >>> index.complexity(5)
+        [1, 3, 7, 9, 8, 7]
+    """
+    
+    def __init__(self, word):
+        """Builds the suffix automaton of the word.
+        
+        Args:
+            word (str): The word indexed, composed of the letters "0", "1" 
+                and "2".
+        """
+        # Checking correct input
+        _check_ternary(word)
+        self.length = len(word)
+        # State 0 is the initial state. For each state: its suffix link, the 
+        # length of its longest factor, the end of the first occurrence of
+        # its factors and its transitions by 0, 1, 2 (-1 if none) in 
+        # goto[3*state:3*state + 3]
+        link = [-1]
+        lengths = [0]
+        first = [-1]
+        cloned = bytearray(1)
+        goto = [-1, -1, -1]
+        last = 0
+        for position, letter in enumerate(word.encode()):
+            letter = letter - 48
+            current = len(lengths)
+            lengths.append(lengths[last] + 1)
+            link.append(0)
+            first.append(position)
+            cloned.append(0)
+            goto.extend((-1, -1, -1))
+            state = last
+            while state != -1 and goto[3*state + letter] == -1:
+                goto[3*state + letter] = current
+                state = link[state]
+            if state != -1:
+                target = goto[3*state + letter]
+                if lengths[state] + 1 == lengths[target]:
+                    link[current] = target
+                else:
+                    clone = len(lengths)
+                    lengths.append(lengths[state] + 1)
+                    link.append(link[target])
+                    first.append(first[target])
+                    cloned.append(1)
+                    goto.extend(goto[3*target:3*target + 3])
+                    while state != -1 and goto[3*state + letter] == target:
+                        goto[3*state + letter] = clone
+                        state = link[state]
+                    link[target] = link[current] = clone
+            last = current
+        
+        # Number of occurrences: each position ends in one state that is 
+        # not a clone, and the occurrences go up the suffix links
+        counts = [1 - c for c in cloned]
+        by_length = sorted(range(1, len(lengths)), key = lengths.__getitem__, reverse = True)
+        for state in by_length:
+            counts[link[state]] = counts[link[state]] + counts[state]
+        del by_length
+        counts[0] = self.length + 1
+        
+        self._link = link
+        self._lengths = lengths
+        self._first = first
+        self._goto = goto
+        self._counts = counts
+    
+    def __len__(self):
+        """The length of the word."""
+        return self.length
+    
+    def __repr__(self):
+        return "FactorIndex(<word of length {}>)".format(self.length)
+    
+    def _state(self, factor):
+        """The state reached by the factor, or None if it is not a factor."""
+        goto = self._goto
+        state = 0
+        for letter in factor:
+            letter = ord(letter) - 48
+            if not 0 <= letter <= 2:
+                return None
+            state = goto[3*state + letter]
+            if state == -1:
+                return None
+        return state
+    
+    def __contains__(self, factor):
+        """Checks if the word has the factor."""
+        return self._state(factor) is not None
+    
+    def count(self, factor):
+        """The number of occurrences of the factor (overlapping ones included)."""
+        state = self._state(factor)
+        return 0 if state is None else self._counts[state]
+    
+    def find(self, factor):
+        """The index of the first occurrence of the factor, or -1."""
+        state = self._state(factor)
+        if state is None:
+            return -1
+        return self._first[state] - len(factor) + 1
+    
+    def complexity(self, n):
+        """The factor complexity C(0), C(1), ..., C(n), where C(k) is the 
+        number of distinct factors of length k."""
+        # The state gives a factor of each length in (length of link, length]
+        difference = [0]*(n + 2)
+        lengths = self._lengths
+        for state in range(1, len(lengths)):
+            shortest = lengths[self._link[state]] + 1
+            if shortest <= n:
+                difference[shortest] = difference[shortest] + 1
+                difference[min(lengths[state], n) + 1] -= 1
+        complexity = list(itertools.accumulate(difference[:n + 1]))
+        complexity[0] = 1
+        return complexity
+
 
 def Ei(i):
     """The involutory antimorphism Ei.
@@ -521,11 +1885,13 @@ def is_pal(seq):
             return(False)
     return(True)
 
-def make_pal_closure(seq):
+def make_pal_closure(seq, backend = "python"):
     """Makes a palindromic closure of a string.
 
     Args:
         seq (string): A word.
+        backend (str): "python", or "numpy" to work on an array of letters
+            (requires NumPy).
     Returns:
         The palindromic closure of the word.
 
@@ -535,17 +1901,17 @@ def make_pal_closure(seq):
         >>> make_pal_closure("102")
         '10201'
     """
-    if is_pal(seq) == True:
-        return(seq)
-    i = 1
-    while is_pal(seq[i:]) != True:
-        i = i + 1
-    logging.debug("{0} longest palindromic suffix: {1}"
-                  .format(seq, seq[i:]))
-    closure = seq + seq[i - 1::-1]
+    _check_backend(backend)
+    if backend == "numpy":
+        return _from_array(_numpy_closure(_to_array(seq), "R"))
+    
+    # The longest palindromic suffix is found in linear time
+    i = len(seq) - _longest_pseudopal_suffix(seq, seq[::-1])
+    _logger.debug("%s longest palindromic suffix: %s", seq, seq[i:])
+    closure = seq + seq[:i][::-1]
     return(closure)
 
-def make_eipal_closure (seq, i):
+def make_eipal_closure (seq, i, backend = "python"):
     """Makes an Ei-palindromic closure of a string.
 
     Args:
@@ -553,6 +1919,8 @@ def make_eipal_closure (seq, i):
             of the letters "0", "1" and "2".
         i: Pseudopalindromic type, can be either 0, 1, 2, or 
             "0", "1", "2", standing for E_0, E_1 and E_2.
+        backend (str): "python", or "numpy" to work on an array of letters
+            (requires NumPy).
     Returns:
         The palindromic closure of the word.
 
@@ -566,33 +1934,31 @@ def make_eipal_closure (seq, i):
     if i not in {0, 1, 2, "0", "1", "2"}:
         raise ValueError("{} is not in A = {{0,1,2}}".format(i))
     _check_ternary(seq)
+    _check_backend(backend)
+    if backend == "numpy":
+        return _from_array(_numpy_closure(_to_array(seq), str(i)))
     
-    ei = Ei(i)
-    if is_eipal(seq, i) == True:
-        return(seq)
-    j = 1
-    while is_eipal(seq[j:], i) != True:
-        j = j+1
-    logging.debug("{0} longest ei-palindromic suffix : {1}"
-                  .format(seq,seq[j:]))
-    closure = seq
-    pref = seq[j-1::-1]
-    for letter in pref:
-        closure = closure + ei[int(letter)]
+    # The longest Ei-palindromic suffix is found in linear time
+    ei = _EI_TRANSLATIONS[int(i)]
+    j = len(seq) - _longest_pseudopal_suffix(seq, seq[::-1].translate(ei))
+    _logger.debug("%s longest ei-palindromic suffix : %s", seq, seq[j:])
+    closure = seq + seq[:j][::-1].translate(ei)
     return(closure)
 
-def make_word012(delta, theta, seed = ""):
+def make_word012(delta, theta = None, seed = "", backend = "python"):
     """Makes a ternary GPS word from (delta, theta).
 
     Args:
         delta (str): The sequence delta of the directive bi-sequence,
             composed of the letters '0', '1' and '2'.
+            It can also be a BiSequence, then theta is not given.
         theta (str): The sequence theta of the directive bi-sequence,
             composed from the letters 'R', '0', '1' and '2', where 
             the last three stand for E_0, E_1 and E_2. Must have the 
             same length as delta.
         seed (str): seed (initial w_0), optional.
-
+        backend (str): "python", or "numpy" to build the word in an array 
+            of letters (requires NumPy).
 
     Returns:
         A string made by pseudopalindromic closure from (delta, theta).
@@ -602,21 +1968,734 @@ def make_word012(delta, theta, seed = ""):
         '00221112200'
     """
     # Checking correct input
-    _check_dt(delta, theta)
+    delta, theta = _checked_dt(delta, theta)
+    _check_backend(backend)
+    if backend == "numpy":
+        return _from_array(_numpy_word012(delta, theta, seed = seed))
     
     # Making w by pseudopalindromic closure
     w = seed
-    for step in range(len(delta)):
-        w = w + delta[step]
-        if theta[step] == "R":
-            w = make_pal_closure(w)
-        elif theta[step] in ["0", "1", "2"]:
-            w = make_eipal_closure(w, theta[step])
+    for step, w in enumerate(_iter_prefixes(delta, theta, seed)):
+        _logger.info("w%s = %s", step+1, w)
+    return(w)
+
+def iter_prefixes(delta, theta = None, seed = ""):
+    """Generates the prefixes w_k of a ternary GPS word from (delta, theta).
+    
+    The prefixes are made one after the other when they are requested,
+    so the generation can be stopped early without making the longer ones.
+
+    Args:
+        delta (str): The sequence delta of the directive bi-sequence,
+            composed of the letters '0', '1' and '2'.
+            It can also be a BiSequence, then theta is not given.
+        theta (str): The sequence theta of the directive bi-sequence,
+            composed from the letters 'R', '0', '1' and '2', where 
+            the last three stand for E_0, E_1 and E_2. Must have the 
+            same length as delta.
+        seed (str): seed (initial w_0), optional.
+
+    Yields:
+        The words w_1, w_2, ..., w_n made by pseudopalindromic closure from
+        (delta, theta), where n is the length of delta.
+
+    Examples:
+        >>> list(iter_prefixes("0011", "012R"))
+        ['0', '0022', '002211', '00221112200']
+    """
+    # Checking correct input
+    delta, theta = _checked_dt(delta, theta)
+    return _iter_prefixes(delta, theta, seed)
+
+def make_words012(pairs, callback, seed = ""):
+    """Makes the ternary GPS words of many directive bi-sequences, sharing
+    the work for their common prefixes.
+    
+    The bi-sequences (normalized, unless there is a seed) are put in a trie
+    of the pairs (delta_i, theta_i), so a prefix w_k common to several 
+    bi-sequences is made only once. The trie is walked depth-first and only
+    the prefixes w_k on the path from the root are kept, each word is given
+    to the callback as soon as it is made.
+    
+    Args:
+        pairs (iterable): The bi-sequences (delta, theta) or BiSequence. They
+            are all checked before the first word is made.
+        callback (callable): Called as `callback(index, word)` for every
+            bi-sequence, where index is its position in pairs. It can keep
+            only the length or a hash of the word.
+        seed (str): seed (initial w_0), optional.
+    
+    Examples:
+        >>> words = {}
+        >>> make_words012([("0011", "012R"), ("00", "01"), ("001", "012")], words.__setitem__)
+        >>> words
+        {1: '0022', 2: '002211', 0: '00221112200'}
+    """
+    # Without seed, the trie is made of the normalized bi-sequences (giving
+    # the same words), whose prefixes w_k are made by the recurrence without
+    # looking for pseudopalindromic suffixes, otherwise by closures.
+    # A node of the trie is [children by the pair delta_i + theta_i, indices
+    # of the bi-sequences ending there]
+    root = [{}, []]
+    for index, pair in enumerate(pairs):
+        if isinstance(pair, BiSequence):
+            delta, theta = _checked_dt(pair, None)
+        else:
+            delta, theta = _checked_dt(*pair)
+        if delta and not seed:
+            delta, theta, _ = _get_internal_normalizer().normalize(delta, theta)
+        node = root
+        for d, t in zip(delta, theta):
+            node = node[0].setdefault(d + t, [{}, []])
+        node[1].append(index)
+    
+    for index in root[1]:
+        callback(index, seed)
+    # The prefixes w_k on the path, their states of the recurrence and the 
+    # children left to visit
+    path = [(seed, None, iter(root[0].items()))]
+    while path:
+        w, recurrence, children = path[-1]
+        child = next(children, None)
+        if child is None:
+            path.pop()
+            continue
+        (letter, antimorphism), (grandchildren, indices) = child
+        if seed:
+            if antimorphism == "R":
+                w = make_pal_closure(w + letter)
+            else:
+                w = make_eipal_closure(w + letter, antimorphism)
+        else:
+            recurrence = _Recurrence(letter) if recurrence is None else recurrence.copy()
+            mirrored = recurrence.step(letter, antimorphism)[2]
+            w = w + letter
+            w = w + w[:mirrored][::-1].translate(_TRANSLATIONS[antimorphism])
+        for index in indices:
+            callback(index, w)
+        if grandchildren:
+            path.append((w, recurrence, iter(grandchildren.items())))
+
+def _iter_prefixes(delta, theta, seed = "", closures = False):
+    """Generates the prefixes w_k of the GPS word from (delta, theta).
+    
+    Without seed, the normalized bi-sequence gives the same word and the
+    closures can be made without looking for pseudopalindromic suffixes
+    (unless `closures` is True). The normalized bi-sequence has more prefixes,
+    w_k is the shortest theta_k-palindromic one longer than w_{k-1}.
+    """
+    if closures or seed or not delta:
+        w = seed
+        for letter, antimorphism in zip(delta, theta):
+            w = w + letter
+            if antimorphism == "R":
+                w = make_pal_closure(w)
+            else:
+                w = make_eipal_closure(w, antimorphism)
+            yield w
+        return
+    
+    new_delta, new_theta, _ = _get_internal_normalizer().normalize(delta, theta)
+    w = ""
+    k = 0
+    for letter, antimorphism, mirrored, _, palindromes in _recurrence_steps(new_delta, new_theta):
+        w = w + letter
+        w = w + w[:mirrored][::-1].translate(_TRANSLATIONS[antimorphism])
+        if k < len(theta) and theta[k] in palindromes:
+            yield w
+            k = k + 1
+
+def _recurrence_steps(delta, theta):
+    """Generates the steps of the construction of the word given by
+    the normalized bi-sequence (delta, theta) without building it.
+    
+    As all the pseudopalindromic prefixes of the word are the prefixes w_j,
+    the longest theta_k-palindromic suffix of w_{k-1}delta_k is 
+    theta_k(a)w'a, where theta_{k-1}(w') is the last w_j that is a 
+    theta_{k-1}theta_ktheta_{k-1}-palindrome followed by the letter
+    theta_{k-1}theta_k(a) (the words i...i being both R- and E_i-palindromes).
+    
+    Yields:
+        Tuples `(letter, antimorphism, mirrored, length, palindromes)` such that 
+        w_k = w_{k-1}letter + antimorphism((w_{k-1}letter)[:mirrored]),
+        length = |w_k| and w_k is a pseudopalindrome exactly for the 
+        antimorphisms in palindromes.
+    """
+    if not delta:
+        return
+    recurrence = _Recurrence(delta[0])
+    for letter, antimorphism in zip(delta, theta):
+        yield recurrence.step(letter, antimorphism)
+
+class _Recurrence:
+    """The state of _recurrence_steps after w_k, which can be copied to 
+    continue with different pairs (as in the trie of make_words012)."""
+    
+    __slots__ = ("first", "theta", "length", "last", "uniform", "palindromes")
+    
+    def __init__(self, first):
+        self.first = first # delta_1
+        self.theta = None # theta_k
+        self.length = 0 # |w_k|
+        # last[(antimorphism, letter)]: the length of the last w_j that is a
+        # palindrome for the antimorphism and is followed by the letter
+        self.last = {(antimorphism, first): 0 for antimorphism in "012R"}
+        self.uniform = True # w_k = i...i
+        self.palindromes = ""
+    
+    def copy(self):
+        other = object.__new__(_Recurrence)
+        for name in self.__slots__:
+            setattr(other, name, getattr(self, name))
+        other.last = dict(self.last)
+        return other
+    
+    def step(self, letter, antimorphism):
+        """Goes from w_k to w_{k+1} given by the pair (letter, antimorphism)
+        and returns the tuple of the step as _recurrence_steps."""
+        length = None
+        if self.theta is not None:
+            previous = self.theta
+            length = self.last.get((_conjugate(previous, antimorphism),
+                                    _image(previous, _image(antimorphism, letter))))
+        if length is not None:
+            suffix = length + 2
+        else:
+            suffix = 1 if _image(antimorphism, letter) == letter else 0
+        mirrored = self.length + 1 - suffix
+        
+        # w_k is a proper prefix of the next words, followed by the letter
+        for previous in self.palindromes:
+            self.last[(previous, letter)] = self.length
+        self.length = self.length + 1 + mirrored
+        self.uniform = self.uniform and letter == self.first and antimorphism in ("R", self.first)
+        self.palindromes = "R" + self.first if self.uniform else antimorphism
+        self.theta = antimorphism
+        return (letter, antimorphism, mirrored, self.length, self.palindromes)
+
+def _image(antimorphism, letter):
+    """The image of a letter by R or E_i ("R", "0", "1" or "2")."""
+    return letter if antimorphism == "R" else Ei(antimorphism)[int(letter)]
+
+def _conjugate(conjugating, antimorphism):
+    """The antimorphism conjugating o antimorphism o conjugating."""
+    if conjugating == "R" or antimorphism == "R":
+        return antimorphism
+    return _image(conjugating, antimorphism)
+
+def _get_normalizer():
+    """Returns a Normalizer012 shared inside the module."""
+    global _shared_normalizer
+    if _shared_normalizer is None:
+        _shared_normalizer = Normalizer012()
+    return _shared_normalizer
+
+_shared_normalizer = None
+
+def _get_internal_normalizer():
+    """Returns a Normalizer012 shared inside the module for the normalizations
+    made to build the words, which log with _internal_logger."""
+    global _internal_normalizer
+    if _internal_normalizer is None:
+        _internal_normalizer = Normalizer012()
+        _internal_normalizer._logger = _internal_logger
+        _internal_normalizer._rules_checker._logger = _internal_logger
+    return _internal_normalizer
+
+_internal_normalizer = None
+
+def is_normalized(delta, theta = None, naive = False):
+    """Checks if the directive bi-sequence is normalized, i.e., if it is 
+    given back unchanged by the normalization, without normalizing it.
+    
+    Use the method first_change of the normalizers to get the index of the 
+    first pair changed.
+    
+    Args:
+        delta (str): The sequence delta of the directive bi-sequence, or 
+            a BiSequence, then theta is not given.
+        theta (str): The sequence theta of the directive bi-sequence.
+        naive (bool): If True, NaiveNormalizer012 is used instead of 
+            Normalizer012, e.g., for cross-checking.
+    
+    Returns:
+        True if the bi-sequence is normalized, otherwise False.
+    
+    Examples:
+        >>> is_normalized("0011", "00RR"), is_normalized("0102110", "02R0121")
+        (True, False)
+    """
+    normalizer = NaiveNormalizer012() if naive else _get_normalizer()
+    return normalizer.first_change(delta, theta) is None
+
+def normalize_many(pairs, workers = None, chunksize = 256, ordered = True, naive = False):
+    """Normalizes many directive bi-sequences in parallel.
+    
+    The bi-sequences are sent in chunks to a pool of processes, each of them
+    having its own normalizer. Only a few chunks are sent in advance, so the
+    pairs can be given by a long iterator.
+
+    Args:
+        pairs (iterable): The bi-sequences (delta, theta) or BiSequence to 
+            normalize.
+        workers (int): The number of processes, by default the number of
+            CPUs. With 1, the bi-sequences are normalized in this process.
+        chunksize (int): The number of bi-sequences sent together to a process.
+        ordered (bool): If True (default), the results are given in the order
+            of the input, otherwise as soon as they are computed, together 
+            with the index of the bi-sequence.
+        naive (bool): If True, NaiveNormalizer012 is used instead of 
+            Normalizer012, e.g., for cross-checking.
+
+    Yields:
+        The tuples `(new_delta, new_theta, notchanged)` returned by normalize,
+        or the tuples `(index, (new_delta, new_theta, notchanged))` if 
+        ordered is False.
+
+    Examples:
+        >>> list(normalize_many([("0011", "00RR"), ("01", "0R")], workers = 2))
+        [('0011', '00RR', True), ('010', '02R', False)]
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        normalizer = NaiveNormalizer012() if naive else _get_normalizer()
+        for index, pair in enumerate(pairs):
+            result = _normalize_pair(normalizer, pair)
+            yield result if ordered else (index, result)
+        return
+    
+    yield from _map_chunks(_normalize_chunk, pairs, workers, chunksize, ordered,
+                           _init_worker, (naive,))
+
+def _map_chunks(function, items, workers, chunksize, ordered = True, 
+                initializer = None, initargs = ()):
+    """Maps function(start, chunk), returning (start, results), on the chunks
+    of items in a pool of processes. Only 2*workers chunks are in progress 
+    at the same time, so the items can be given by a long iterator.
+    
+    Yields the results, or the tuples (index, result) if ordered is False.
+    """
+    chunks = _chunks(items, chunksize)
+    with multiprocessing.Pool(workers, initializer, initargs) as pool:
+        # The chunks in progress: their results in the order of the input, 
+        # or the queue of the finished chunks (results or errors) if the
+        # order does not matter. Nothing else keeps the results, so only 
+        # the chunks in progress are in memory.
+        pending = collections.deque()
+        finished = queue.Queue()
+        in_progress = 0
+        
+        def submit():
+            nonlocal in_progress
+            chunk = next(chunks, None)
+            if chunk is None:
+                return
+            if ordered:
+                pending.append(pool.apply_async(function, chunk))
+            else:
+                pool.apply_async(function, chunk, callback = finished.put,
+                                 error_callback = finished.put)
+                in_progress = in_progress + 1
+        
+        for _ in range(2*workers):
+            submit()
+        while pending or in_progress:
+            if ordered:
+                start, results = pending.popleft().get()
+            else:
+                done = finished.get()
+                in_progress = in_progress - 1
+                if isinstance(done, BaseException):
+                    raise done
+                start, results = done
+            submit()
+            for index, result in enumerate(results, start):
+                yield result if ordered else (index, result)
+
+def _chunks(pairs, chunksize):
+    """Generates the tuples (index of the first pair, list of pairs) of 
+    the consecutive chunks of pairs."""
+    pairs = iter(pairs)
+    start = 0
+    chunk = list(itertools.islice(pairs, chunksize))
+    while chunk:
+        yield (start, chunk)
+        start = start + len(chunk)
+        chunk = list(itertools.islice(pairs, chunksize))
+
+def _init_worker(naive):
+    """Creates the normalizer of a worker process."""
+    global _worker_normalizer
+    _worker_normalizer = NaiveNormalizer012() if naive else Normalizer012()
+
+def _normalize_chunk(start, chunk):
+    """Normalizes a chunk of bi-sequences in a worker process."""
+    return (start, [_normalize_pair(_worker_normalizer, pair) for pair in chunk])
+
+def _normalize_each(chunk):
+    """Normalizes a chunk of bi-sequences in a worker process, the exception
+    raised by a bi-sequence being returned in place of its result."""
+    results = []
+    for pair in chunk:
+        try:
+            results.append(_normalize_pair(_worker_normalizer, pair))
+        except Exception as error:
+            results.append(error)
+    return results
+
+def _normalize_pair(normalizer, pair):
+    """Normalizes the pair (delta, theta) or the BiSequence."""
+    if isinstance(pair, BiSequence):
+        return normalizer.normalize(pair)
+    return normalizer.normalize(*pair)
+
+_worker_normalizer = None
+
+def cross_validate(length, checkpoint = None, workers = None, shard_length = None,
+                   max_word_length = 10**6):
+    """Compares Normalizer012 with NaiveNormalizer012 on all the directive
+    bi-sequences of a given length.
+    
+    The bi-sequences are split into shards by their first pairs, which are
+    checked in a pool of processes. With a checkpoint file, the progress is
+    saved after every shard and a new run with the same file resumes where
+    the previous one stopped. The naive normalizer is not run on inputs 
+    making words longer than max_word_length (their length is given by the
+    result of Normalizer012), they are counted as skipped.
+
+    Args:
+        length (int): The length of the bi-sequences checked.
+        checkpoint (str): The path of the JSON file where the progress is 
+            saved, optional.
+        workers (int): The number of processes, by default the number of
+            CPUs. With 1, the shards are checked in this process.
+        shard_length (int): The number of first pairs defining a shard, by 
+            default 2 (at most length), giving 144 shards.
+        max_word_length (int): The longest word made by the naive normalizer,
+            None for no limit.
+
+    Returns:
+        A dictionary with the numbers of bi-sequences `checked` and 
+        `skipped` and the list `mismatches` of the tuples 
+        `(delta, theta, result, naive_result)`.
+
+    Examples:
+        >>> report = cross_validate(2, workers = 1)
+        >>> report["checked"], report["skipped"], report["mismatches"]
+        (144, 0, [])
+    """
+    if shard_length is None:
+        shard_length = 2
+    shard_length = min(shard_length, length)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    
+    report = {"length": length, "shard_length": shard_length, "done": [],
+              "checked": 0, "skipped": 0, "mismatches": []}
+    if checkpoint is not None and os.path.exists(checkpoint):
+        with open(checkpoint) as checkpoint_file:
+            saved = json.load(checkpoint_file)
+        if (saved["length"], saved["shard_length"]) != (length, shard_length):
+            raise ValueError("The checkpoint {0} is for the length {1} and the shard "
+                             "length {2}".format(checkpoint, saved["length"], saved["shard_length"]))
+        report = saved
+        _logger.info("Resuming from %s: %s shards done", checkpoint, len(report["done"]))
+    
+    done = set(report["done"])
+    tasks = [(length, shard_length, shard, max_word_length) 
+             for shard in range(len(_PAIRS)**shard_length) if shard not in done]
+    if workers <= 1:
+        results = map(_cross_validate_shard, tasks)
+    else:
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap_unordered(_cross_validate_shard, tasks)
+    try:
+        for shard, checked, skipped, mismatches in results:
+            report["done"].append(shard)
+            report["checked"] = report["checked"] + checked
+            report["skipped"] = report["skipped"] + skipped
+            report["mismatches"].extend(mismatches)
+            for mismatch in mismatches:
+                _logger.error("Mismatch for (%s, %s): %s != %s", *mismatch)
+            if checkpoint is not None:
+                _save_checkpoint(checkpoint, report)
+    finally:
+        if workers > 1:
+            pool.terminate()
+    report["mismatches"] = [tuple(tuple(x) if isinstance(x, list) else x for x in mismatch) 
+                            for mismatch in report["mismatches"]]
+    return {key: report[key] for key in ("checked", "skipped", "mismatches")}
+
+def _cross_validate_shard(task):
+    """Compares the normalizers on the bi-sequences of a shard, given by the
+    index of its first pairs."""
+    length, shard_length, shard, max_word_length = task
+    prefix = []
+    for _ in range(shard_length):
+        shard, code = divmod(shard, len(_PAIRS))
+        prefix.append(_PAIRS[code])
+    prefix = "".join(reversed(prefix))
+    normalizer = _get_normalizer()
+    naive_normalizer = NaiveNormalizer012()
+    checked = skipped = 0
+    mismatches = []
+    for suffix in itertools.product(_PAIRS, repeat = length - shard_length):
+        biseq = prefix + "".join(suffix)
+        delta, theta = biseq[0::2], biseq[1::2]
+        result = normalizer.normalize(delta, theta)
+        if max_word_length is not None:
+            word_length = 0
+            for *_, word_length, _ in _recurrence_steps(result[0], result[1]):
+                pass
+            if word_length > max_word_length:
+                skipped = skipped + 1
+                continue
+        naive_result = naive_normalizer.normalize(delta, theta)
+        checked = checked + 1
+        if naive_result != result:
+            mismatches.append((delta, theta, result, naive_result))
+    return (task[2], checked, skipped, mismatches)
+
+def _save_checkpoint(path, report):
+    """Writes the report in the JSON file, replacing the file only when it
+    is complete."""
+    temporary = path + ".tmp"
+    with open(temporary, "w") as checkpoint_file:
+        json.dump(report, checkpoint_file)
+    os.replace(temporary, path)
+
+def iter_normalized(length, canonical = False, workers = 1):
+    """Generates all the normalized directive bi-sequences of a given length.
+    
+    The bi-sequences are enumerated depth-first, in the order of letters
+    0,1,2 used by Normalizer012. A branch is left as soon as its last pair
+    makes a normalization rule applicable, since all the prefixes of a
+    normalized bi-sequence are normalized. The other bi-sequences are 
+    obtained by permuting the letters.
+
+    Args:
+        length (int): The length of the bi-sequences.
+        canonical (bool): If True, only the bi-sequences with the letters
+            in the order 0,1,2 are generated.
+        workers (int): The number of processes among which the subtrees
+            of the enumeration are split. The bi-sequences are generated
+            in the same order as with one process.
+
+    Yields:
+        The normalized bi-sequences (delta, theta).
+
+    Examples:
+        >>> sorted(iter_normalized(1))
+        [('0', '0'), ('1', '1'), ('2', '2')]
+        >>> list(iter_normalized(2, canonical = True))
+        [('00', '00'), ('01', '02')]
+    """
+    if workers <= 1:
+        leaves = _iter_canonical_normalized(length)
+    else:
+        leaves = _map_subtrees(_normalized_subtrees, length, workers)
+    for codes in leaves:
+        delta, theta = _decode_biseq(codes)
+        if canonical:
+            yield (delta, theta)
         else:
-            logging.error("wrong symbol")
+            yield from _letter_permutations(delta, theta)
+
+def count_normalized(length):
+    """Counts the normalized directive bi-sequences of a given length.
+    
+    A bi-sequence with the letters in the order 0,1,2 is normalized if
+    the automata of the rules never reach a rule while reading it, so 
+    the bi-sequences are counted by the states of the automata instead of
+    being enumerated.
+    
+    Args:
+        length (int): The length of the bi-sequences.
+    
+    Returns:
+        The number of the bi-sequences (delta, theta) of the length such
+        that `Normalizer012().normalize(delta, theta)[2]` is True.
+
+    Examples:
+        >>> [count_normalized(n) for n in range(1, 6)]
+        [3, 9, 51, 483, 5283]
+        >>> count_normalized(14)
+        14562493846515
+    """
+    if length == 0:
+        return 1
+    checker = _get_normalizer()._rules_checker
+    # counts[(prefix rules state, factor rules state, ordered, initial)]
+    counts = {(0, 0, False, True): 1}
+    for position in range(length):
+        next_counts = collections.defaultdict(int)
+        for (prefix_state, factor_state, ordered, initial), count in counts.items():
+            for code, (d, t) in enumerate(_PAIRS):
+                if not ordered and (d == "2" or d + t == "01" or (position == 0 and d != "0")):
+                    continue
+                if initial and d + t == "0R":
+                    continue
+                next_prefix_state = checker._prefix_goto[prefix_state][code]
+                next_factor_state = checker._goto[factor_state][code]
+                if (checker._prefix_output[next_prefix_state] is None 
+                        and checker._output[next_factor_state] is None):
+                    next_counts[(next_prefix_state, next_factor_state, 
+                                 ordered or d == "1" or t == "2", 
+                                 initial and d + t == "00")] += count
+        counts = next_counts
+    # Each bi-sequence gives 6 by permuting the letters, except (0^l, 0^l)
+    return sum(count*(3 if initial else 6) for (_, _, _, initial), count in counts.items())
+
+def _iter_canonical_normalized(length, prefix = b""):
+    """Generates depth-first the normalized bi-sequences of the length 
+    with the letters in the order 0,1,2, given by the codes of their pairs,
+    that start with the codes in prefix.
+    """
+    checker = _get_internal_normalizer()._rules_checker
+    biseq = bytearray()
+    scan = _RulesScan()
+    
+    def walk(ordered, initial):
+        position = len(biseq)
+        if position == length:
+            yield bytes(biseq)
             return
-        logging.info("w{0} = {1}".format(step+1,w))
-    return(w)
+        for code in prefix[position:position + 1] or range(len(_PAIRS)):
+            d, t = _PAIRS[code]
+            # The letters are in the order 0,1,2 (see _change_letters_order)
+            if not ordered and (d == "2" or d + t == "01" or (position == 0 and d != "0")):
+                continue
+            # The prefix (0^l, {R,E_0}^l) is changed by the initial normalization
+            if initial and d + t == "0R":
+                continue
+            biseq.append(code)
+            if checker.find_applicable_rule(biseq, scan) is None:
+                yield from walk(ordered or d == "1" or t == "2", initial and d + t == "00")
+            del biseq[-1]
+            scan.rewind(position)
+    
+    return walk(False, True)
+
+def _letter_permutations(delta, theta):
+    """The distinct bi-sequences obtained from (delta, theta) by permuting
+    the letters 0, 1, 2."""
+    images = []
+    for permutation in itertools.permutations("012"):
+        table = str.maketrans("012", "".join(permutation))
+        image = (delta.translate(table), theta.translate(table))
+        if image not in images:
+            images.append(image)
+    return images
+
+def _map_subtrees(function, length, workers, chunksize = 16, levels = 3):
+    """Maps function(length, start, prefixes), returning (start, results), 
+    on the chunks of the subtrees of the enumeration of the normalized 
+    bi-sequences of the length in a pool of processes, and yields the 
+    results in the order of the enumeration.
+    
+    The subtrees are rooted at the first depth giving at least 4*workers
+    chunks, and at least length - levels, so that the results of a chunk 
+    are bounded (12**levels leaves per subtree). The prefixes are generated
+    as the chunks are sent, only 2*workers of them being in progress.
+    """
+    subtrees = 4*workers*chunksize
+    depth = 0
+    while depth < length and sum(1 for _ in itertools.islice(
+            _iter_canonical_normalized(depth), subtrees)) < subtrees:
+        depth = depth + 1
+    depth = max(depth, length - levels)
+    prefixes = _iter_canonical_normalized(depth)
+    return _map_chunks(functools.partial(function, length), prefixes, workers, chunksize)
+
+def _normalized_subtrees(length, start, prefixes):
+    """The normalized bi-sequences (codes) of the subtrees of the 
+    enumeration rooted at the prefixes."""
+    return (start, [codes for prefix in prefixes 
+                    for codes in _iter_canonical_normalized(length, prefix)])
+
+def _check_backend(backend):
+    """Checks that the backend is known and available."""
+    if backend not in {"python", "numpy"}:
+        raise ValueError("{} is not a backend, use 'python' or 'numpy'".format(backend))
+    if backend == "numpy" and numpy is None:
+        raise ImportError("The backend 'numpy' requires NumPy")
+
+def _to_array(seq):
+    """The word as an array of uint8 letters 0, 1, 2."""
+    return numpy.frombuffer(seq.encode("ascii"), dtype=numpy.uint8) - ord("0")
+
+def _from_array(word):
+    """The word of the array of uint8 letters."""
+    return (word + ord("0")).astype(numpy.uint8).tobytes().decode("ascii")
+
+def _numpy_closure(word, antimorphism):
+    """The pseudopalindromic closure of the array of letters for R, E_0, E_1 
+    or E_2 ("R", "0", "1" or "2").
+    
+    The suffix word[i:] is a pseudopalindrome if and only if it is the prefix
+    image[:n - i] of the image of the word. The polynomial hashes of all the
+    suffixes of the word and of all the prefixes of the image are compared
+    at once from their prefix sums, and the first candidate equal to its
+    prefix of the image (compared letter by letter, in case of a collision
+    of the hashes) gives the longest pseudopalindromic suffix.
+    """
+    n = len(word)
+    if antimorphism == "R":
+        image = word[::-1]
+    else:
+        image = _NUMPY_TABLES[antimorphism][word[::-1]]
+    powers = _numpy_powers(n + 1)
+    word_hashes = _numpy_prefix_hashes(word, powers)
+    image_hashes = _numpy_prefix_hashes(image, powers)
+    # hash(word[i:]) = (H_w[n] - H_w[i])/B^i and hash(image[:n - i]) = H_i[n - i]
+    suffixes = (word_hashes[n] + _HASH_MODULUS - word_hashes) % _HASH_MODULUS
+    prefixes = powers * image_hashes[::-1] % _HASH_MODULUS
+    for i in numpy.flatnonzero(suffixes == prefixes):
+        if numpy.array_equal(word[i:], image[:n - i]):
+            break
+    return numpy.concatenate((word, image[n - i:]))
+
+def _numpy_powers(length):
+    """The array of the powers B^j (mod the hash modulus) for j < length, 
+    extended by doubling and kept for the next closures."""
+    global _hash_powers
+    while len(_hash_powers) < length:
+        step = _hash_powers[-1] * _HASH_BASE % _HASH_MODULUS
+        _hash_powers = numpy.concatenate((_hash_powers, _hash_powers * step % _HASH_MODULUS))
+    return _hash_powers[:length]
+
+def _numpy_prefix_hashes(word, powers):
+    """The hashes H[k] = sum of (word[j] + 1)*B^j for j < k (mod the hash 
+    modulus), for k from 0 to len(word)."""
+    hashes = numpy.zeros(len(word) + 1, dtype=numpy.uint64)
+    # The terms are less than 3*2**31, their sums fit in 64 bits
+    numpy.cumsum((word + numpy.uint64(1))*powers[:len(word)] % _HASH_MODULUS, out=hashes[1:])
+    return hashes % _HASH_MODULUS
+
+def _numpy_word012(delta, theta, seed = "", closures = False):
+    """The GPS word from (delta, theta) as an array of letters, made as in
+    `_iter_prefixes`."""
+    if closures or seed or not delta:
+        w = _to_array(seed)
+        for letter, antimorphism in zip(delta, theta):
+            w = _numpy_closure(numpy.append(w, numpy.uint8(int(letter))), antimorphism)
+        return w
+    
+    # The word is filled in place following the normalized bi-sequence
+    new_delta, new_theta, _ = _get_internal_normalizer().normalize(delta, theta)
+    steps = list(_recurrence_steps(new_delta, new_theta))
+    w = numpy.empty(steps[-1][3], dtype=numpy.uint8)
+    end = 0
+    for letter, antimorphism, mirrored, length, _ in steps:
+        w[end] = int(letter)
+        end = end + 1
+        if antimorphism == "R":
+            w[end:length] = w[:mirrored][::-1]
+        else:
+            w[end:length] = _NUMPY_TABLES[antimorphism][w[:mirrored][::-1]]
+        end = length
+    return w
 
 def set_logging(logging_level = "ERROR"):
     """Sets the logging level of the module.
@@ -625,29 +2704,125 @@ def set_logging(logging_level = "ERROR"):
     If it is set to "INFO" or "DEBUG", the fuction prints more 
     information about how ternary words are being processed.
     
+    The module does not configure logging on import. The messages go to
+    the handlers of the application, and if it has none, set_logging
+    prints them on the standard error.
+    
+    The normalizations made by the module to build the words or to 
+    enumerate the normalized bi-sequences log only warnings and errors,
+    unless the level of the child logger "internal" is set.
+    
     Args:
         level(str): "ERROR" (default), "INFO" or "DEBUG"
     """
-    logging.getLogger().setLevel(logging_level)
+    _logger.setLevel(logging_level)
+    if not logging.getLogger().handlers and not any(
+            isinstance(handler, logging.StreamHandler) for handler in _logger.handlers):
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _logger.addHandler(handler)
+
+def _failure_function(seq):
+    """Failure function of the Knuth-Morris-Pratt algorithm: fail[k] is the
+    length of the longest proper border of seq[:k] (and fail[0] = -1).
+    """
+    fail = [-1]*(len(seq) + 1)
+    k = -1
+    for index, letter in enumerate(seq):
+        while k >= 0 and seq[k] != letter:
+            k = fail[k]
+        k = k + 1
+        fail[index + 1] = k
+    return fail
+
+def _longest_pseudopal_suffix(seq, image, fail = None):
+    """Length of the longest pseudopalindromic suffix of seq, where image
+    is the image of seq by the antimorphism (R or E_i).
+    
+    A suffix of seq is a pseudopalindrome if and only if it is also a prefix
+    of the image, so the longest one is found by the Knuth-Morris-Pratt 
+    algorithm looking for the image in seq. The failure function of image
+    may be given if it is already known.
+    """
+    if fail is None:
+        fail = _failure_function(image)
+    k = 0
+    for letter in seq:
+        while k >= 0 and (k == len(image) or image[k] != letter):
+            k = fail[k]
+        k = k + 1
+    return k
+
+def _sparse_table(values, function):
+    """Sparse table of the values: table[level][i] is function (min or max) 
+    of values[i:i + 2**level]."""
+    table = [values]
+    while 1 << len(table) <= len(values):
+        previous = table[-1]
+        half = 1 << (len(table) - 1)
+        table.append(list(map(function, previous, previous[half:])))
+    return table
+
+def _encode_biseq(delta, theta):
+    """Interleaves delta and theta (already checked) into a bytearray of 
+    the codes of the pairs (delta_i, theta_i)."""
+    return bytearray(map(operator.add, delta.encode().translate(_CODE_OF_DELTA),
+                         theta.encode().translate(_CODE_OF_THETA)))
+
+def _decode_biseq(biseq):
+    """Gives back (delta, theta) from the codes of the pairs (delta_i, theta_i)."""
+    return (biseq.translate(_DELTA_OF_CODE).decode(), 
+            biseq.translate(_THETA_OF_CODE).decode())
 
 def _check_ternary(seq):
     """Raises an error if seq is not in A = {"0","1", "2"}"""
-    if not all([x in set("012") for x in seq]):
+    if not _TERNARY.issuperset(seq):
         raise ValueError("{} is not in A = {{0,1,2}}".format(seq))
     
 def _check_theta(seq):
     """Raises an error if seq is not in A = {"0","1", "2", "R"}"""
-    if not all([x in set("012R") for x in seq]):
+    if not _THETA_LETTERS.issuperset(seq):
         raise ValueError("{} is not in A = {{0,1,2,R}}".format(seq))
         
 def _check_dt(delta, theta):
-    """Check if the input delta and theta are correct"""
+    """Check if the input delta and theta are correct and returns them as
+    strings (other sequences of letters, e.g. lists, are joined)."""
     _check_ternary(delta)
     _check_theta(theta)
     if len(delta) != len(theta):
         raise ValueError("The length of delta and theta are not the same")
+    return (delta if isinstance(delta, str) else "".join(delta), 
+            theta if isinstance(theta, str) else "".join(theta))
+
+def _check_no_theta(theta):
+    """Raises an error if theta is given together with a BiSequence."""
+    if theta is not None:
+        raise TypeError("theta cannot be given with a BiSequence")
+
+def _checked_dt(delta, theta):
+    """The strings (delta, theta) checked (see _check_dt), or taken from the
+    BiSequence given as delta (already checked)."""
+    if isinstance(delta, BiSequence):
+        _check_no_theta(theta)
+        return delta.delta, delta.theta
+    return _check_dt(delta, theta)
         
-if __name__ == "__main__":
-    import doctest
-    doctest.testmod()
+def main(argv = None):
+    """Command line interface of the module (see tgpc_cli.main).
+    
+    `python tgpc.py normalize [files]` normalizes the bi-sequences of the
+    files, `python tgpc.py word [files]` makes their words and 
+    `python tgpc.py serve` answers normalization requests. Without 
+    arguments, the doctests are run.
 
+    Args:
+        argv (list): The arguments, by default those of the command line.
+
+    Returns:
+        The exit status.
+    """
+    import tgpc_cli
+    return tgpc_cli.main(argv)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,482 @@
+"""Command line interface of tgpc and normalization from asyncio code.
+
+AsyncNormalizer normalizes directive bi-sequences in a pool of processes
+without blocking the event loop, and the command `serve` answers 
+normalization requests with it, on the standard input and output or over
+HTTP. The module is imported by tgpc.main, only when the command line is 
+used.
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import csv
+import doctest
+import fileinput
+import functools
+import http
+import json
+import os
+import sys
+
+import tgpc
+from tgpc import (BiSequence, GPSWord, make_word012, normalize_many, _check_no_theta, 
+                  _chunks, _get_normalizer, _init_worker, _logger, _map_chunks, 
+                  _normalize_each)
+
+class AsyncNormalizer:
+    """Normalizes directive bi-sequences from asyncio code without blocking
+    the event loop.
+
+    The bi-sequences given to normalize wait in a bounded queue and are
+    coalesced into micro-batches normalized by a pool of processes. A batch
+    is sent when it has max_batch bi-sequences or max_delay seconds after 
+    its first one. At most `workers` batches are in progress, so under load
+    the next batch grows while the workers are busy. The rules are built in
+    this process before the pool is started, so the forked workers share
+    them.
+
+    Args:
+        workers (int): The number of processes, by default the number of CPUs.
+        max_batch (int): The largest number of bi-sequences in a batch.
+        max_delay (float): The time in seconds a batch waits for more 
+            bi-sequences when it is not full.
+        max_pending (int): The size of the queue, normalize waits when it
+            is full.
+        timeout (float): The default time limit of normalize in seconds,
+            None for no limit.
+        naive (bool): If True, NaiveNormalizer012 is used.
+
+    Examples:
+        >>> async def example():
+        ...     async with AsyncNormalizer(workers = 2) as normalizer:
+        ...         return await asyncio.gather(normalizer.normalize("0011", "00RR"),
+        ...                                     normalizer.normalize("01", "0R"))
+        >>> asyncio.run(example())
+        [('0011', '00RR', True), ('010', '02R', False)]
+    """
+
+    def __init__(self, workers = None, max_batch = 64, max_delay = 0.001, max_pending = 1024,
+                 timeout = None, naive = False):
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.naive = naive
+        self._pool = None
+        self._queue = None
+        self._slots = None
+        self._batcher = None
+        self._batches = set()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        """Starts the pool of processes and the batching task (done by the
+        first normalize otherwise)."""
+        if self._pool is not None:
+            return
+        if not self.naive:
+            _get_normalizer() # the rules, inherited by the workers
+        self._pool = concurrent.futures.ProcessPoolExecutor(
+            self.workers, initializer = _init_worker, initargs = (self.naive,))
+        # Forking the workers now, before a server accepts connections whose
+        # sockets they would inherit (keeping them open)
+        await asyncio.get_running_loop().run_in_executor(self._pool, os.getpid)
+        self._queue = asyncio.Queue(self.max_pending)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._batcher = asyncio.ensure_future(self._make_batches())
+
+    async def close(self):
+        """Waits for the batches in progress and stops the pool of processes.
+        The bi-sequences still in the queue are cancelled."""
+        if self._pool is None:
+            return
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            self._queue.get_nowait()[1].cancel()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions = True)
+        self._pool.shutdown()
+        self._pool = None
+
+    async def normalize(self, delta, theta = None, timeout = None):
+        """Normalizes the directive bi-sequence in a process of the pool.
+
+        Args:
+            delta (str): The sequence delta of the directive bi-sequence, or 
+                a BiSequence, then theta is not given.
+            theta (str): The sequence theta of the directive bi-sequence.
+            timeout (float): The time limit in seconds, including the wait in 
+                the queue, by default the timeout of the normalizer.
+
+        Returns:
+            The tuple `(new_delta, new_theta, notchanged)` of 
+            Normalizer012.normalize.
+
+        Raises:
+            ValueError: If the bi-sequence is not valid (before it is queued).
+            asyncio.TimeoutError: If the bi-sequence is not normalized in time.
+                It is then left out of the next batches, but a batch already
+                sent is normalized to the end.
+        """
+        if isinstance(delta, BiSequence):
+            _check_no_theta(theta)
+            biseq = delta
+        else:
+            biseq = BiSequence(delta, theta)
+        await self.start()
+        if timeout is None:
+            timeout = self.timeout
+        return await asyncio.wait_for(self._submit(biseq), timeout)
+
+    async def _submit(self, biseq):
+        """Queues the bi-sequence and waits for its result. When it is
+        cancelled (timeout), its future is cancelled and left out of the 
+        batches."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((biseq, future))
+        return await future
+
+    async def _make_batches(self):
+        """Collects the batches from the queue and sends them to the pool."""
+        while True:
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            try:
+                self._take_queued(batch)
+                if len(batch) < self.max_batch and self.max_delay > 0:
+                    await asyncio.sleep(self.max_delay)
+                    self._take_queued(batch)
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    future.cancel()
+                raise
+            batch = [(biseq, future) for biseq, future in batch if not future.done()]
+            if batch:
+                task = asyncio.ensure_future(self._run_batch(batch))
+                self._batches.add(task)
+                task.add_done_callback(self._batches.discard)
+            else:
+                self._slots.release()
+
+    def _take_queued(self, batch):
+        """Moves bi-sequences from the queue to the batch, up to max_batch."""
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def _run_batch(self, batch):
+        """Normalizes the batch in the pool and sets the results of the
+        futures not cancelled meanwhile. A bi-sequence whose normalization
+        fails gets its exception, the others of the batch their results."""
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self._pool, _normalize_each, [biseq for biseq, _ in batch])
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+        else:
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+async def _answer(normalizer, request):
+    """The status and the response (dictionary) to a request, the JSON 
+    object `{"delta": ..., "theta": ...}` with an optional "id" copied in
+    the response. An invalid request gets the status 400 and an unexpected
+    error the status 500, with the response `{"error": ...}`."""
+    response = {}
+    try:
+        record = json.loads(request)
+        if not isinstance(record, dict):
+            raise ValueError("a request is a JSON object")
+        if "id" in record:
+            response["id"] = record["id"]
+        delta, theta = record.get("delta"), record.get("theta")
+        if not isinstance(delta, str) or not isinstance(theta, str):
+            raise ValueError("a request has the strings delta and theta")
+        result = await normalizer.normalize(delta, theta)
+    except ValueError as error:
+        response["error"] = str(error)
+        return 400, response
+    except asyncio.TimeoutError:
+        response["error"] = "timeout"
+        return 504, response
+    except Exception as error:
+        _logger.exception("Error while answering the request %r", request)
+        response["error"] = "{0}: {1}".format(type(error).__name__, error)
+        return 500, response
+    response.update(delta = result[0], theta = result[1], notchanged = result[2])
+    return 200, response
+
+async def _serve_stdio(normalizer, input, output):
+    """Answers the requests read from input, one JSON object per line, by
+    the JSON responses written in output as soon as they are computed (not
+    necessarily in order, see "id"). At most max_pending requests of the
+    normalizer are in progress."""
+    loop = asyncio.get_running_loop()
+    in_progress = asyncio.Semaphore(normalizer.max_pending)
+    tasks = set()
+
+    async def answer(line):
+        try:
+            _, response = await _answer(normalizer, line)
+            output.write(json.dumps(response) + "\n")
+            output.flush()
+        finally:
+            in_progress.release()
+
+    while True:
+        await in_progress.acquire()
+        line = await loop.run_in_executor(None, input.readline)
+        if not line:
+            break
+        if not line.strip():
+            in_progress.release()
+            continue
+        task = asyncio.ensure_future(answer(line))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+
+async def _serve_http(normalizer, reader, writer):
+    """Answers the HTTP requests `POST /normalize` of a connection, whose 
+    bodies are the JSON requests of _answer. A malformed HTTP request is
+    answered with the status 400 and closes the connection."""
+    
+    async def respond(status, response):
+        data = json.dumps(response).encode()
+        writer.write("HTTP/1.1 {0} {1}\r\nContent-Type: application/json\r\n"
+                     "Content-Length: {2}\r\n\r\n".format(
+                         status, http.HTTPStatus(status).phrase, len(data)).encode() + data)
+        await writer.drain()
+    
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            headers = {}
+            line = await reader.readline()
+            while line.strip():
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+                line = await reader.readline()
+            try:
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+            except ValueError:
+                await respond(400, {"error": "malformed HTTP request"})
+                break
+            if (method, path) == ("POST", "/normalize"):
+                status, response = await _answer(normalizer, body)
+            else:
+                status, response = 404, {"error": "the requests are POST /normalize"}
+            await respond(status, response)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass # connection closed by the client
+    finally:
+        writer.close()
+
+async def _serve(args):
+    """Runs the server of the command `serve` until the end of the input
+    (stdio) or until it is interrupted (HTTP)."""
+    async with AsyncNormalizer(args.workers, args.max_batch, args.max_delay, args.max_pending,
+                               args.timeout, args.naive) as normalizer:
+        if args.port is None:
+            await _serve_stdio(normalizer, sys.stdin, sys.stdout)
+        else:
+            server = await asyncio.start_server(functools.partial(_serve_http, normalizer),
+                                                args.host, args.port)
+            _logger.info("Serving on %s port %s", args.host, args.port)
+            async with server:
+                await server.serve_forever()
+    return 0
+
+def main(argv = None):
+    """Command line interface of the module.
+    
+    `python tgpc.py normalize [files]` normalizes the bi-sequences read from
+    the files (or the standard input), one per line, and writes the results
+    in the same order. `python tgpc.py word [files]` writes the lengths of 
+    the words (or the words with --words). The records are read and written
+    as a stream by a pool of processes, so the files can be much larger than
+    the memory. Without arguments, the doctests of the module are run.
+    
+    `python tgpc.py serve` answers normalization requests with AsyncNormalizer:
+    the JSON objects `{"delta": ..., "theta": ..., "id": ...}` read from the
+    standard input, one per line, or the bodies of `POST /normalize` with
+    --port. The responses are the JSON objects `{"delta": ..., "theta": ...,
+    "notchanged": ..., "id": ...}` or `{"error": ..., "id": ...}`, written as
+    soon as they are computed.
+    
+    The formats of the records (--format) are:
+        plain: `delta theta` separated by spaces, tabs or a comma,
+        csv: the columns delta and theta (with an optional header),
+        jsonl: `{"delta": ..., "theta": ...}` or `[delta, theta]`.
+    The results are written in the same format: the new delta and theta and
+    the flag notchanged, or the length or the word.
+
+    Args:
+        argv (list): The arguments, by default those of the command line.
+
+    Returns:
+        The exit status.
+    """
+    parser = argparse.ArgumentParser(prog = "tgpc", description = 
+                                     "Normalization of ternary directive bi-sequences.")
+    commands = parser.add_subparsers(dest = "command")
+    normalize_parser = commands.add_parser("normalize", help = "normalize bi-sequences")
+    normalize_parser.add_argument("--naive", action = "store_true",
+                                  help = "use NaiveNormalizer012")
+    word_parser = commands.add_parser("word", help = "make the words of bi-sequences")
+    word_parser.add_argument("--words", action = "store_true",
+                             help = "write the words instead of their lengths")
+    word_parser.add_argument("--max-length", type = int, default = 10**7,
+                             help = "longest word written (default 10**7)")
+    for command_parser in (normalize_parser, word_parser):
+        command_parser.add_argument("files", nargs = "*", 
+                                    help = "input files, the standard input if none or -")
+        command_parser.add_argument("--format", choices = ("plain", "csv", "jsonl"), 
+                                    default = "plain")
+        command_parser.add_argument("-o", "--output", help = "output file (standard output by default)")
+        command_parser.add_argument("--workers", type = int, default = None,
+                                    help = "number of processes (the number of CPUs by default)")
+        command_parser.add_argument("--chunksize", type = int, default = 1024,
+                                    help = "number of records sent together to a process")
+    serve_parser = commands.add_parser("serve", help = "normalize the requests of a local "
+                                       "server (stdio or HTTP)")
+    serve_parser.add_argument("--port", type = int, default = None,
+                              help = "HTTP port (the standard input and output if none)")
+    serve_parser.add_argument("--host", default = "127.0.0.1")
+    serve_parser.add_argument("--naive", action = "store_true", help = "use NaiveNormalizer012")
+    serve_parser.add_argument("--workers", type = int, default = None,
+                              help = "number of processes (the number of CPUs by default)")
+    serve_parser.add_argument("--max-batch", type = int, default = 64,
+                              help = "largest number of requests normalized together")
+    serve_parser.add_argument("--max-delay", type = float, default = 0.001,
+                              help = "seconds a batch waits for more requests")
+    serve_parser.add_argument("--max-pending", type = int, default = 1024,
+                              help = "largest number of queued requests")
+    serve_parser.add_argument("--timeout", type = float, default = None,
+                              help = "time limit of a request in seconds")
+    commands.add_parser("doctest", help = "run the doctests of the module")
+    args = parser.parse_args(argv)
+    
+    if args.command in (None, "doctest"):
+        modules = (tgpc, sys.modules[__name__])
+        return 1 if any(doctest.testmod(module).failed for module in modules) else 0
+    if args.command == "serve":
+        return asyncio.run(_serve(args))
+    
+    workers = args.workers if args.workers is not None else (os.cpu_count() or 1)
+    lines = fileinput.input(args.files or ["-"])
+    records = _read_records(lines, args.format)
+    if args.command == "normalize":
+        results = normalize_many(records, workers, args.chunksize, naive = args.naive)
+    else:
+        function = functools.partial(_word_chunk, args.words, args.max_length)
+        if workers <= 1:
+            results = (result for start, chunk in _chunks(records, args.chunksize)
+                       for result in function(start, chunk)[1])
+        else:
+            results = _map_chunks(function, records, workers, args.chunksize)
+    
+    output = open(args.output, "w", newline = "") if args.output else sys.stdout
+    try:
+        write = _result_writer(output, args.format)
+        for result in results:
+            write(result)
+    except ValueError as error:
+        print("tgpc: error: {}".format(error), file = sys.stderr)
+        return 1
+    finally:
+        lines.close()
+        if output is not sys.stdout:
+            output.close()
+        else:
+            output.flush()
+    return 0
+
+def _read_records(lines, format):
+    """Generates the bi-sequences (BiSequence) of the lines in the format
+    "plain", "csv" or "jsonl"."""
+    if format == "csv":
+        rows = csv.reader(lines)
+    elif format == "jsonl":
+        rows = (json.loads(line) if line.strip() else [] for line in lines)
+    else:
+        rows = (line.replace(",", " ").split() for line in lines)
+    for number, row in enumerate(rows, 1):
+        if isinstance(row, dict):
+            row = [row.get("delta"), row.get("theta")]
+        if not row:
+            continue
+        if format == "csv" and number == 1 and row == ["delta", "theta"]:
+            continue
+        try:
+            if len(row) != 2 or not all(isinstance(x, str) for x in row):
+                raise ValueError("a record is a delta and a theta")
+            yield BiSequence(row[0], row[1])
+        except ValueError as error:
+            raise ValueError("record {0}: {1}".format(number, error)) from None
+
+def _result_writer(output, format):
+    """The function writing a result (tuple of normalize, length or word)
+    in the format "plain", "csv" or "jsonl"."""
+    if format == "csv":
+        writer = csv.writer(output)
+        def write(result):
+            writer.writerow(result if isinstance(result, tuple) else (result,))
+    elif format == "jsonl":
+        def write(result):
+            if isinstance(result, tuple):
+                record = {"delta": result[0], "theta": result[1], "notchanged": result[2]}
+            elif isinstance(result, int):
+                record = {"length": result}
+            else:
+                record = {"word": result}
+            output.write(json.dumps(record) + "\n")
+    else:
+        def write(result):
+            if isinstance(result, tuple):
+                output.write("{0} {1} {2}\n".format(*result))
+            else:
+                output.write("{}\n".format(result))
+    return write
+
+def _word_chunk(words, max_length, start, chunk):
+    """The lengths of the words (or the words) of a chunk of bi-sequences."""
+    results = []
+    for biseq in chunk:
+        length = GPSWord(biseq).length
+        if not words:
+            results.append(length)
+        elif length > max_length:
+            raise ValueError("the word of {0} has the length {1} (more than {2})"
+                             .format(biseq, length, max_length))
+        else:
+            results.append(make_word012(biseq))
+    return (start, results)
+
+if __name__ == "__main__":
+    sys.exit(main())